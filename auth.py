@@ -1,12 +1,17 @@
+import logging
 import os
+import threading
+import time
 import jwt
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from fastapi import Request, HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from starlette.middleware.base import BaseHTTPMiddleware
-from sqlalchemy.orm import Session
+from starlette.types import ASGIApp, Receive, Scope, Send
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
 
 from models import User
 from dotenv import load_dotenv
@@ -14,10 +19,16 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SECRET_KEY = os.getenv("SECRET_KEY", "YOUR_SUPER_SECRET_KEY_CHANGE_ME")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7
 
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "4096"))
+
 security = HTTPBearer(auto_error=False)
 
 PUBLIC_PATHS = [
@@ -29,6 +40,7 @@ PUBLIC_PATHS = [
     "/resend-code",
     "/auth/token",
 ]
+PUBLIC_PREFIXES = tuple(PUBLIC_PATHS)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -48,42 +60,80 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-class JWTAuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        for path in PUBLIC_PATHS:
-            if request.url.path.startswith(path):
-                return await call_next(request)
+class TokenCache:
+    """Small LRU of already verified tokens; an entry is dropped once its exp has passed."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, token: str) -> Optional[int]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        exp, user_id = entry
+        if exp is not None and exp <= time.time():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return user_id
+
+    def set(self, token: str, exp: Optional[float], user_id: int) -> None:
+        self._entries[token] = (exp, user_id)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+class JWTAuthMiddleware:
+    """Plain ASGI middleware: puts the token's user id into request.state and never touches bodies."""
+
+    def __init__(self, app: ASGIApp, cache_size: int = TOKEN_CACHE_MAX_SIZE):
+        self.app = app
+        self.token_cache = TokenCache(cache_size)
 
-        if request.method == "OPTIONS":
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(PUBLIC_PREFIXES) or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
 
-        auth_header = request.headers.get("Authorization")
-        request.state.user_id = None
-        print(auth_header, 9999)
+        state = scope.setdefault("state", {})
+        state["user_id"] = None
 
+        auth_header = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                auth_header = value.decode("latin-1")
+                break
 
         if auth_header and auth_header.startswith("Bearer "):
-            token = auth_header.split(" ")[1]
-            try:
-                payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-                user_id = payload.get("sub")
-                print(user_id)
+            state["user_id"] = self.authenticate(auth_header[7:])
 
-                if user_id:
-                    request.state.user_id = int(user_id)
+        await self.app(scope, receive, send)
 
-            except jwt.ExpiredSignatureError:
-                print("Token expired")
-                pass
-            except jwt.InvalidTokenError as e:
-                print(f"Invalid token: {e}")
-                pass
-            except Exception as e:
-                print(f"Auth error: {e}")
-                pass
+    def authenticate(self, token: str) -> Optional[int]:
+        user_id = self.token_cache.get(token)
+        if user_id is not None:
+            return user_id
 
-        response = await call_next(request)
-        return response
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            user_id = payload.get("sub")
+            if not user_id:
+                return None
+
+            user_id = int(user_id)
+            self.token_cache.set(token, payload.get("exp"), user_id)
+            return user_id
+
+        except jwt.ExpiredSignatureError:
+            logger.info("Rejected access token: expired")
+        except jwt.InvalidTokenError as e:
+            # only the error class: messages may quote parts of the token
+            logger.warning("Rejected access token: %s", type(e).__name__)
+        except Exception:
+            logger.exception("Access token check failed")
+        return None
 
 
 def get_current_user_id(
@@ -101,10 +151,100 @@ def get_current_user_id(
     return user_id
 
 
+class UserCache:
+    """Bounded LRU of user rows keyed by id, each entry living at most ttl seconds."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def generation(self) -> int:
+        """Take this before reading a row from the database and pass it to set()."""
+        return self._generation
+
+    def get(self, user_id: int) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, values = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return values
+
+    def set(self, user_id: int, values: dict, generation: int) -> None:
+        with self._lock:
+            # something was invalidated while the row was being read; it may be stale
+            if generation != self._generation:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+user_cache = UserCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS)
+
+USER_FIELDS = [column.key for column in User.__table__.columns]
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: User) -> None:
+    # at flush, so this session's own later reads miss; again at commit, since
+    # another request may have cached the old committed row in between
+    user_cache.invalidate(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    for user_id in session.info.pop("changed_user_ids", ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_users(session: Session) -> None:
+    session.info.pop("changed_user_ids", None)
+
+
+def load_user(db: Session, user_id: int) -> Optional[User]:
+    values = user_cache.get(user_id)
+    if values is not None:
+        # a detached copy with the row's identity: never shared between
+        # sessions, and merge()/add() treat it as the existing row
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    generation = user_cache.generation()
+    user = db.query(User).filter(User.id == user_id).first()
+    if user:
+        user_cache.set(user_id, {field: getattr(user, field) for field in USER_FIELDS}, generation)
+    return user
+
+
 def require_admin(request: Request, db: Session) -> User:
     user_id = get_current_user_id(request)
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = load_user(db, user_id)
 
     if not user:
         raise HTTPException(
@@ -0,0 +1,90 @@
+"""BaseHTTPMiddleware JWT auth vs the pure ASGI JWTAuthMiddleware under concurrent load.
+
+Usage: python benchmarks/bench_auth_middleware.py [requests] [concurrency]
+Needs httpx.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import jwt
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from auth import ALGORITHM, PUBLIC_PATHS, SECRET_KEY, JWTAuthMiddleware, create_access_token
+
+
+class LegacyJWTAuthMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        for path in PUBLIC_PATHS:
+            if request.url.path.startswith(path):
+                return await call_next(request)
+
+        if request.method == "OPTIONS":
+            return await call_next(request)
+
+        auth_header = request.headers.get("Authorization")
+        request.state.user_id = None
+
+        if auth_header and auth_header.startswith("Bearer "):
+            token = auth_header.split(" ")[1]
+            try:
+                payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+                user_id = payload.get("sub")
+                if user_id:
+                    request.state.user_id = int(user_id)
+            except jwt.InvalidTokenError:
+                pass
+
+        return await call_next(request)
+
+
+def make_app(middleware):
+    app = FastAPI()
+    app.add_middleware(middleware)
+
+    @app.get("/ping")
+    def ping(request: Request):
+        return {"user_id": request.state.user_id}
+
+    return app
+
+
+async def drive(app, total, concurrency, tokens):
+    transport = httpx.ASGITransport(app=app)
+    timings = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = iter(range(total))
+
+        async def worker():
+            for i in queue:
+                headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+                started = time.perf_counter()
+                response = await client.get("/ping", headers=headers)
+                timings.append(time.perf_counter() - started)
+                assert response.status_code == 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return total / elapsed, timings
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    tokens = [create_access_token({"sub": i}) for i in range(1, 201)]
+
+    for label, middleware in (("legacy", LegacyJWTAuthMiddleware), ("asgi", JWTAuthMiddleware)):
+        rps, timings = asyncio.run(drive(make_app(middleware), total, concurrency, tokens))
+        p95 = statistics.quantiles(timings, n=20)[-1] * 1000
+        print(f"{label:>6}: {rps:8.0f} req/s, p95 {p95:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Table-setting DOCX report: python-docx paragraphs vs the streamed XML writer.
+
+Usage: python benchmarks/bench_docx.py [rows...]   (default 100 1000 10000)
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx_utils
+
+DISHES = ["Борщ", "Плов", "Котлета", "Пюре", "Компот", "Хлеб", "Салат витаминный", "Суп-харчо"]
+
+
+def make_rows(count, seed=0):
+    rnd = random.Random(seed)
+    return [
+        {
+            "user_name": f"Ученик{n} Фамилия{n}",
+            "user_class": f"{rnd.randint(1, 11)}{rnd.choice('АБВГ')}",
+            "dishes": rnd.sample(DISHES, rnd.randint(2, 5)),
+        }
+        for n in range(count)
+    ]
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [100, 1000, 10000]
+    directory = tempfile.mkdtemp()
+    docx_utils.generate_table_setting_report([], "warmup.docx", directory)
+
+    for size in sizes:
+        rows = make_rows(size)
+        timings = {}
+        for writer in ("python-docx", "xml"):
+            started = time.perf_counter()
+            docx_utils.generate_table_setting_report(rows, f"{writer}_{size}.docx", directory, writer=writer)
+            timings[writer] = time.perf_counter() - started
+        print(
+            f"{size:>6} rows: python-docx {timings['python-docx'] * 1000:8.1f} ms, "
+            f"xml {timings['xml'] * 1000:7.1f} ms, x{timings['python-docx'] / timings['xml']:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Per-request cost of the auth middleware: the old printing dispatch vs JWTAuthMiddleware + queued logging.
+
+Calls the middleware stack directly over ASGI, without a client or a router,
+so the numbers are the middleware's own overhead. Both variants write to a
+line-buffered file, the way a container with PYTHONUNBUFFERED=1 writes stdout.
+
+Usage: python benchmarks/bench_logging.py [requests] [invalid_token_percent]
+"""
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from fastapi import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+import logging_setup
+from auth import ALGORITHM, PUBLIC_PATHS, SECRET_KEY, JWTAuthMiddleware, create_access_token
+
+
+class PrintingJWTAuthMiddleware(BaseHTTPMiddleware):
+    """The middleware as it was: BaseHTTPMiddleware printing the header and user id on every request."""
+
+    async def dispatch(self, request: Request, call_next):
+        for path in PUBLIC_PATHS:
+            if request.url.path.startswith(path):
+                return await call_next(request)
+
+        if request.method == "OPTIONS":
+            return await call_next(request)
+
+        auth_header = request.headers.get("Authorization")
+        request.state.user_id = None
+        print(auth_header, 9999)
+
+        if auth_header and auth_header.startswith("Bearer "):
+            token = auth_header.split(" ")[1]
+            try:
+                payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+                user_id = payload.get("sub")
+                print(user_id)
+                if user_id:
+                    request.state.user_id = int(user_id)
+            except jwt.ExpiredSignatureError:
+                print("Token expired")
+            except jwt.InvalidTokenError as e:
+                print(f"Invalid token: {e}")
+
+        return await call_next(request)
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def make_scope(token: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/orders",
+        "raw_path": b"/orders",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+
+
+async def drive(app, tokens, total):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    timings = []
+    for i in range(total):
+        scope = make_scope(tokens[i % len(tokens)])
+        started = time.perf_counter()
+        await app(scope, receive, send)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(label, timings):
+    mean = statistics.fmean(timings) * 1e6
+    p99 = statistics.quantiles(timings, n=100)[-1] * 1e6
+    print(f"{label:>8}: mean {mean:7.1f} us/request, p99 {p99:7.1f} us")
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    invalid_percent = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    valid = [create_access_token({"sub": i}) for i in range(1, 201)]
+    invalid = [token[:-4] + "AAAA" for token in valid[:invalid_percent]]
+    tokens = valid[:100 - len(invalid)] + invalid
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "print.log"), "w", buffering=1) as out, contextlib.redirect_stdout(out):
+            timings = asyncio.run(drive(PrintingJWTAuthMiddleware(endpoint), tokens, total))
+        report("print", timings)
+
+        with open(os.path.join(tmp, "json.log"), "w", buffering=1) as out:
+            logging_setup.configure_logging(stream=out)
+            app = logging_setup.RequestIdMiddleware(JWTAuthMiddleware(endpoint))
+            timings = asyncio.run(drive(app, tokens, total))
+            logging_setup.shutdown_logging()
+        report("queued", timings)
+
+        print(f"(invalid tokens: {len(invalid)}% of requests; JSON log lines are written by the listener thread)")
+
+
+if __name__ == "__main__":
+    main()
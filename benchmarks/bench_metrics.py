@@ -0,0 +1,81 @@
+"""Overhead of the metrics instrumentation: MetricsMiddleware per request and the cursor hooks per statement.
+
+Usage: python benchmarks/bench_metrics.py [requests] [statements]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+import metrics
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def make_scope() -> dict:
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/orders",
+        "headers": [(b"host", b"bench")],
+    }
+
+
+async def drive(app, total):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    timings = []
+    for _ in range(total):
+        started = time.perf_counter()
+        await app(make_scope(), receive, send)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def run_statements(engine, total):
+    with engine.connect() as connection:
+        started = time.perf_counter()
+        for _ in range(total):
+            connection.execute(text("SELECT 1")).scalar()
+        return time.perf_counter() - started
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    statements = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+
+    for label, app in (
+            ("bare", endpoint),
+            ("metrics", metrics.MetricsMiddleware(endpoint)),
+            ("+timing", metrics.MetricsMiddleware(endpoint, server_timing=True)),
+    ):
+        timings = asyncio.run(drive(app, total))
+        print(f"{label:>8}: mean {statistics.fmean(timings) * 1e6:6.2f} us/request")
+
+    plain = create_engine("sqlite://")
+    plain_seconds = run_statements(plain, statements)
+
+    hooked = create_engine("sqlite://")
+    metrics.instrument_engine(hooked)
+    token = metrics.request_stats_var.set(metrics.RequestStats())
+    hooked_seconds = run_statements(hooked, statements)
+    metrics.request_stats_var.reset(token)
+
+    print(f"   plain: {plain_seconds / statements * 1e6:6.2f} us/statement")
+    print(f"  hooked: {hooked_seconds / statements * 1e6:6.2f} us/statement")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""POST /orders pipeline: per-item lookups vs one batched query + bulk insert.
+
+Usage: python benchmarks/bench_orders.py [orders] [items_per_order]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# importing main creates and migrates the app database; keep that away from ./app.db
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_app.db"
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, Dish, DishType, Order, OrderItem, OrderStatus, User
+from schemas import OrderCreate
+
+
+def legacy_build_order(db, user_id, order_data):
+    total_price = 0.0
+    new_order = Order(user_id=user_id, week_start_date=order_data.week_start_date, status=OrderStatus.PENDING)
+    db.add(new_order)
+    db.flush()
+
+    for day_req in order_data.days:
+        for item in day_req.items:
+            if item.quantity > 0:
+                dish = db.query(Dish).filter(Dish.id == item.dish_id).first()
+                if not dish: continue
+
+                total_price += dish.price_rub * item.quantity
+                db.add(OrderItem(
+                    order_id=new_order.id,
+                    dish_id=dish.id,
+                    day_of_week=day_req.day_of_week,
+                    quantity=item.quantity
+                ))
+
+    new_order.total_amount = total_price
+    return new_order
+
+
+def make_order(dish_ids, items_per_order):
+    days = []
+    per_day = max(1, items_per_order // 5)
+    for day in range(5):
+        picked = dish_ids[day * per_day:(day + 1) * per_day]
+        days.append({"day_of_week": day, "items": [{"dish_id": d, "quantity": 1 + d % 2} for d in picked]})
+    return OrderCreate(week_start_date=date(2026, 2, 2), days=days)
+
+
+def run(build, orders, items_per_order):
+    tmp = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{tmp}/bench.db")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+
+    with SessionLocal() as db:
+        db.add(User(name="bench", secondary_name="user", email="bench@example.com", status="5A"))
+        db.add_all(
+            Dish(name=f"Dish {i}", type=DishType.MAIN, composition="", quantity_grams=100, price_rub=100 + i)
+            for i in range(items_per_order)
+        )
+        db.commit()
+        dish_ids = [d.id for d in db.query(Dish.id)]
+
+    queries = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(*args):
+        queries[0] += 1
+
+    order_data = make_order(dish_ids, items_per_order)
+    timings = []
+    for _ in range(orders):
+        with SessionLocal() as db:
+            started = time.perf_counter()
+            order = build(db, 1, order_data)
+            db.commit()
+            db.refresh(order)
+            timings.append(time.perf_counter() - started)
+
+    engine.dispose()
+    return queries[0] / orders, timings
+
+
+def main():
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    items_per_order = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    import main as app_main
+
+    for label, build in (("before", legacy_build_order), ("after", app_main.build_order)):
+        per_order, timings = run(build, orders, items_per_order)
+        p95 = statistics.quantiles(timings, n=20)[-1] * 1000
+        print(f"{label:>6}: {per_order:5.1f} queries/order, p95 {p95:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
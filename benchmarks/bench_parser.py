@@ -0,0 +1,123 @@
+"""Menu parser throughput on synthetic provider menus (format of uploads/2_Меню.txt).
+
+Usage: python benchmarks/bench_parser.py [--write DIR] [sizes...]
+Default sizes are 1000 10000 100000 dishes. --write also saves the corpus files.
+"""
+import io
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import BaseModel
+
+from menu_parser import CATEGORY_MAP, parse_menu_file, parse_menu_text, validate_dishes
+
+HEADER = ["Название", "Состав", "Кол-во (г/шт.)", "Цена", "Период действия в меню", "Штрихкод"]
+CATEGORIES = ["Вторые горячие блюда", "Гарниры", "Салаты", "Супы", "Напитки", "Хлеб"]
+WORDS = ["Мясо кур", "Говядина", "Картофель", "Лук репчатый", "Морковь", "Масло сливочное",
+         "Соль", "Рис", "Томат-паста", "Перец б/з", "Мука пшеничная", "Зелень свежая"]
+
+
+def make_corpus(dishes, seed=0):
+    rnd = random.Random(seed)
+    lines = list(HEADER)
+    per_category = max(1, dishes // len(CATEGORIES))
+    for n in range(dishes):
+        if n % per_category == 0:
+            lines.append(CATEGORIES[(n // per_category) % len(CATEGORIES)])
+        lines.append(f"Блюдо {n} {rnd.choice(WORDS).lower()}")
+        lines.append(", ".join(rnd.sample(WORDS, 6)) + ".")
+        lines.append(f"{rnd.randrange(50, 350, 10)} г.")
+        lines.append(f"{rnd.randrange(20, 300, 5)} ₽")
+    return "\r\n".join(lines) + "\r\n"
+
+
+class LegacyParsedDish(BaseModel):
+    name: str
+    type: str
+    composition: str
+    quantity_grams: int
+    price_rub: float
+
+
+LEGACY_IGNORE_HEADERS = [h.lower() for h in HEADER]
+
+
+def legacy_parse_menu_text(content):
+    results = []
+    current_type = "MAIN"
+    buffer = []
+    number_pattern = re.compile(r'\d+')
+
+    for line in content.splitlines():
+        clean_line = line.strip()
+        lower_line = clean_line.lower()
+        if not clean_line:
+            continue
+        if lower_line in LEGACY_IGNORE_HEADERS:
+            continue
+        if lower_line in CATEGORY_MAP:
+            current_type = CATEGORY_MAP[lower_line]
+            buffer = []
+            continue
+        buffer.append(clean_line)
+        if len(buffer) == 4:
+            try:
+                w_match = number_pattern.search(buffer[2])
+                p_match = number_pattern.search(buffer[3])
+                results.append(LegacyParsedDish(
+                    name=buffer[0],
+                    type=current_type,
+                    composition=buffer[1],
+                    quantity_grams=int(w_match.group()) if w_match else 0,
+                    price_rub=float(p_match.group()) if p_match else 0.0
+                ))
+            except Exception:
+                pass
+            buffer = []
+    return results
+
+
+def timed(fn, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    args = sys.argv[1:]
+    write_dir = None
+    if args[:1] == ["--write"]:
+        write_dir, args = args[1], args[2:]
+    sizes = [int(a) for a in args] or [1000, 10000, 100000]
+
+    for size in sizes:
+        text = make_corpus(size)
+        raw = text.encode("utf-8")
+        lines = text.count("\n")
+        if write_dir:
+            os.makedirs(write_dir, exist_ok=True)
+            with open(os.path.join(write_dir, f"menu_{size}.txt"), "wb") as f:
+                f.write(raw)
+
+        cases = [
+            ("legacy text", legacy_parse_menu_text, text),
+            ("text", parse_menu_text, text),
+            ("stream", lambda data: validate_dishes(parse_menu_file(io.BytesIO(data))), raw),
+        ]
+        for label, fn, data in cases:
+            elapsed, result = timed(fn, data)
+            assert len(result) == size, (label, len(result))
+            print(f"{size:>7} dishes {label:>12}: {lines / elapsed:12,.0f} lines/s ({elapsed * 1000:8.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
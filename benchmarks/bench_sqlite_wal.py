@@ -0,0 +1,95 @@
+"""Concurrent order writes (plus menu readers) on SQLite with and without WAL.
+
+Usage: python benchmarks/bench_sqlite_wal.py [writers] [orders_per_writer] [readers]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import make_engine
+from models import Base, Dish, DishType, User
+from schemas import OrderCreate
+
+
+def run(wal, writers, orders_per_writer, readers):
+    from main import build_order
+
+    tmp = tempfile.mkdtemp()
+    engine = make_engine(f"sqlite:///{tmp}/bench.db", wal=wal)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+
+    with SessionLocal() as db:
+        db.add(User(name="bench", secondary_name="user", email="bench@example.com", status="5A"))
+        db.add_all(
+            Dish(name=f"Dish {i}", type=DishType.MAIN, composition="", quantity_grams=100, price_rub=100 + i)
+            for i in range(30)
+        )
+        db.commit()
+
+    order_data = OrderCreate(
+        week_start_date=date(2026, 2, 2),
+        days=[{"day_of_week": d, "items": [{"dish_id": d * 6 + i + 1, "quantity": 1} for i in range(6)]} for d in range(5)],
+    )
+    errors = [0]
+    done = threading.Event()
+
+    def writer():
+        for _ in range(orders_per_writer):
+            with SessionLocal() as db:
+                try:
+                    build_order(db, 1, order_data)
+                    db.commit()
+                except OperationalError:
+                    db.rollback()
+                    errors[0] += 1
+
+    def reader():
+        while not done.is_set():
+            with SessionLocal() as db:
+                try:
+                    db.query(Dish).all()
+                except OperationalError:
+                    errors[0] += 1
+
+    reader_threads = [threading.Thread(target=reader) for _ in range(readers)]
+    writer_threads = [threading.Thread(target=writer) for _ in range(writers)]
+    for t in reader_threads:
+        t.start()
+
+    started = time.perf_counter()
+    for t in writer_threads:
+        t.start()
+    for t in writer_threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    done.set()
+    for t in reader_threads:
+        t.join()
+    engine.dispose()
+
+    written = writers * orders_per_writer - errors[0]
+    return written / elapsed, errors[0]
+
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    orders_per_writer = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    readers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    for label, wal in (("rollback journal", False), ("WAL", True)):
+        rate, errors = run(wal, writers, orders_per_writer, readers)
+        print(f"{label:>16}: {rate:7.0f} orders/s, {errors} lock errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Registration against a slow local SMTP stand-in: the request path must not wait for mail.
+
+Starts a minimal SMTP server that takes SMTP_DELAY seconds per message and
+rejects the first few recipients with 451, registers users through the
+app (lifespan running, so the outbox dispatcher is live), and checks that
+request latency stays flat, every mail arrives once retries kick in, and
+the dispatcher reuses pooled connections rather than opening one per mail.
+
+Usage: python benchmarks/check_email_outbox.py [registrations] [smtp_delay_seconds]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TRANSIENT_FAILURES = 3
+
+
+class StandInSMTP:
+    """Just enough SMTP for smtplib, on a background event loop."""
+
+    def __init__(self, delay: float, transient_failures: int):
+        self.delay = delay
+        self.failures_left = transient_failures
+        self.messages = []
+        self.connections = 0
+        self.port = None
+        self._ready = threading.Event()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+
+        async def reply(line):
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        await reply("220 stand-in ESMTP")
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line.decode().strip().upper()
+            if command.startswith("EHLO"):
+                await reply("250-stand-in")
+                await reply("250 8BITMIME")
+            elif command.startswith("RCPT") and self.failures_left > 0:
+                self.failures_left -= 1
+                await reply("451 try again later")
+            elif command == "DATA":
+                await reply("354 end with .")
+                data = []
+                while (chunk := await reader.readline()) != b".\r\n":
+                    data.append(chunk)
+                await asyncio.sleep(self.delay)
+                self.messages.append(b"".join(data))
+                await reply("250 queued")
+            elif command == "QUIT":
+                await reply("221 bye")
+                break
+            else:
+                await reply("250 ok")
+        writer.close()
+
+    def serve(self):
+        async def main():
+            server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+            self.port = server.sockets[0].getsockname()[1]
+            self._ready.set()
+            async with server:
+                await server.serve_forever()
+
+        threading.Thread(target=asyncio.run, args=(main(),), daemon=True).start()
+        self._ready.wait()
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+
+    smtp = StandInSMTP(delay, TRANSIENT_FAILURES)
+    smtp.serve()
+
+    workdir = tempfile.mkdtemp(prefix="canteen-outbox-")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'outbox.db')}",
+        SMTP_HOST="127.0.0.1",
+        SMTP_PORT=str(smtp.port),
+        SMTP_USER="",
+        SMTP_STARTTLS="0",
+        OUTBOX_BACKOFF_SECONDS="0.2",
+        OUTBOX_POLL_SECONDS="0.2",
+        LOG_LEVEL="WARNING",
+        # every registration comes from the same test client address
+        RATE_LIMIT_ENABLED="0",
+    )
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func
+
+    import main as app_module
+    from models import EmailStatus, OutboxEmail
+
+    timings = []
+    with TestClient(app_module.app) as client:
+        for i in range(total):
+            payload = {"name": f"User{i}", "secondary_name": "Mail", "email": f"mail{i}@example.com", "status": "student"}
+            started = time.perf_counter()
+            response = client.post("/register", json=payload)
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == 201, response.text
+
+        response = client.post("/resend-code", json={"email": "mail0@example.com"})
+        assert response.status_code == 200, response.text
+        expected = total + 1
+
+        deadline = time.monotonic() + 30 + expected * delay
+        while len(smtp.messages) < expected and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    with app_module.SessionLocal() as db:
+        statuses = dict(
+            db.query(OutboxEmail.status, func.count(OutboxEmail.id)).group_by(OutboxEmail.status).all()
+        )
+        retried = db.query(OutboxEmail).filter(OutboxEmail.attempts > 0).count()
+
+    print(f"register p50 {statistics.median(timings) * 1000:.1f} ms, max {max(timings) * 1000:.1f} ms "
+          f"(SMTP takes {delay * 1000:.0f} ms per message)")
+    print(f"delivered {len(smtp.messages)}/{expected} over {smtp.connections} SMTP connections, "
+          f"{retried} retried after a 451")
+    print(f"outbox: {({status.value: count for status, count in statuses.items()})}")
+
+    assert len(smtp.messages) == expected
+    assert statuses.get(EmailStatus.SENT) == expected
+    assert max(timings) < delay, "registration waited for SMTP"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Checks that per-request query counts don't grow with the number of order items.
+
+Places orders of increasing size against a throwaway SQLite database and
+exits with status 1 if POST /orders or GET /orders/{id} issue more
+statements for a big order than for a one-item order.
+
+Usage: python benchmarks/check_query_counts.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/counts.db"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import main
+from auth import create_access_token
+from models import Dish, DishType, User
+
+ITEM_COUNTS = [1, 5, 40]
+
+
+def audit():
+    with main.SessionLocal() as db:
+        db.add(User(name="user", secondary_name="u", email="user@example.com", status="5A", email_verified=True))
+        db.add_all(
+            Dish(name=f"Dish {i}", type=list(DishType)[i % len(DishType)], composition="",
+                 quantity_grams=100, price_rub=100 + i)
+            for i in range(max(ITEM_COUNTS))
+        )
+        db.commit()
+
+    client = TestClient(main.app)
+    headers = {"Authorization": "Bearer " + create_access_token({"sub": 1})}
+    counter = [0]
+
+    def count(*args):
+        counter[0] += 1
+
+    # async routes run on their own engine when DB_MODE=async
+    engines = [main.engine] + ([main.async_engine.sync_engine] if main.async_engine is not None else [])
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", count)
+
+    def queries(method, url, **kwargs):
+        counter[0] = 0
+        response = client.request(method, url, headers=headers, **kwargs)
+        assert response.status_code == 200, (url, response.status_code, response.text)
+        return counter[0], response.json()
+
+    # fills the user cache, so every measured request sees the same warm state
+    queries("GET", "/users/me")
+
+    results = {}
+    for items in ITEM_COUNTS:
+        days = [
+            {"day_of_week": d, "items": [{"dish_id": i + 1, "quantity": 1} for i in range(items) if i % 5 == d]}
+            for d in range(5)
+        ]
+        create_count, order = queries("POST", "/orders", json={"week_start_date": "2026-02-02", "days": days})
+        detail_count, detail = queries("GET", f"/orders/{order['id']}")
+        assert sum(len(day["items"]) for day in detail["days"]) == items
+        results[items] = (create_count, detail_count)
+        print(f"{items:>3} items: POST /orders {create_count} queries, GET /orders/{{id}} {detail_count} queries")
+
+    if len(set(results.values())) != 1:
+        print("query count depends on the number of items")
+        sys.exit(1)
+    print("ok")
+
+
+if __name__ == "__main__":
+    audit()
@@ -0,0 +1,96 @@
+"""EXPLAIN QUERY PLAN audit of the report and order queries.
+
+Drives the endpoints against a throwaway SQLite database, records every
+SELECT they issue and exits with status 1 if SQLite plans a full scan of
+a growing table (orders, order_items) for any of them.
+
+Usage: python benchmarks/check_query_plans.py
+"""
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/plans.db"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import main
+from auth import create_access_token
+from models import Dish, DishType, User
+
+GUARDED_TABLES = ("orders", "order_items")
+FULL_SCAN = re.compile(r"\bSCAN (\w+)")
+
+ENDPOINTS = [
+    ("user", "/orders"),
+    ("user", "/orders/1"),
+    ("admin", "/admin/reports/summary?date_query=2026-02-02"),
+    ("admin", "/admin/reports/docx?date_query=2026-02-02"),
+]
+
+
+def seed():
+    with main.SessionLocal() as db:
+        db.add(User(name="admin", secondary_name="a", email="admin@example.com", status="staff",
+                    is_admin=True, email_verified=True))
+        db.add(User(name="user", secondary_name="u", email="user@example.com", status="5A", email_verified=True))
+        db.add_all(
+            Dish(name=f"Dish {i}", type=DishType.MAIN, composition="", quantity_grams=100, price_rub=100 + i)
+            for i in range(10)
+        )
+        db.commit()
+
+
+def audit():
+    seed()
+    client = TestClient(main.app)
+    headers = {
+        "admin": {"Authorization": "Bearer " + create_access_token({"sub": 1})},
+        "user": {"Authorization": "Bearer " + create_access_token({"sub": 2})},
+    }
+    client.post("/orders", headers=headers["user"], json={
+        "week_start_date": "2026-02-02",
+        "days": [{"day_of_week": 0, "items": [{"dish_id": 1, "quantity": 2}]}],
+    })
+    client.patch("/admin/orders/1/status?status=PAID", headers=headers["admin"])
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            statements.append((statement, parameters))
+
+    # async routes run on their own engine when DB_MODE=async
+    engines = [main.engine] + ([main.async_engine.sync_engine] if main.async_engine is not None else [])
+
+    failures = []
+    for role, url in ENDPOINTS:
+        statements.clear()
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", record)
+        response = client.get(url, headers=headers[role])
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", record)
+        assert response.status_code == 200, (url, response.status_code, response.text)
+
+        with main.engine.connect() as conn:
+            for statement, parameters in statements:
+                plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+                for row in plan:
+                    detail = row[-1]
+                    match = FULL_SCAN.search(detail)
+                    if match and match.group(1) in GUARDED_TABLES:
+                        failures.append((url, detail, " ".join(statement.split())))
+
+    for url, detail, statement in failures:
+        print(f"FULL SCAN in {url}: {detail}\n    {statement}")
+    if failures:
+        sys.exit(1)
+    print(f"ok: no full scans of {', '.join(GUARDED_TABLES)} in {len(ENDPOINTS)} endpoints")
+
+
+if __name__ == "__main__":
+    audit()
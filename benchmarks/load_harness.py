@@ -0,0 +1,329 @@
+"""Load harness: seeds a throwaway SQLite database and drives the app in-process over ASGI.
+
+Scenarios:
+  monday_rush      users placing next week's orders at the same time
+  menu_polling     clients refreshing /menu and /module-menu, half with If-None-Match
+  admin_reports    day summaries, DOCX table reports and order item exports
+  payment_uploads  payment proofs posted for pending orders
+
+Prints one JSON document (throughput, latency percentiles, queries per
+request per scenario), so runs on two commits can be diffed directly.
+Query counts and DB time come from the metrics registry, so statements run
+while a response is still streaming are included.
+
+Usage: python benchmarks/load_harness.py [--users 2000] [--requests 1000] [--concurrency 32] [--output run.json]
+Needs httpx.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ("monday_rush", "menu_polling", "admin_reports", "payment_uploads")
+
+SEEDED_WEEK = date(2026, 2, 2)
+RUSH_WEEK = date(2026, 2, 9)
+MENU_FILE = os.path.join(ROOT, "uploads", "2_Меню.txt")
+PAID_SHARE = 0.7
+DISHES_PER_DAY = 12
+
+
+def prepare_environment(workdir: str) -> str:
+    """Points the app at the scratch directory; has to run before main is imported."""
+    database_url = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+    os.environ.update(
+        DATABASE_URL=database_url,
+        UPLOAD_DIR=os.path.join(workdir, "uploads"),
+        REPORT_CACHE_DIR=os.path.join(workdir, "reports"),
+        METRICS_ENABLED="1",
+    )
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    return database_url
+
+
+def seed(database_url: str, users: int, items_per_order: int, rng: random.Random) -> dict:
+    from init_db import init_db
+
+    # init_db echoes its SQL and prints the admin token
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db(database_url)
+
+    from sqlalchemy import func, update
+
+    import main
+    import report_stats
+    from menu_parser import parse_menu_file
+    from menu_sync import sync_menu
+    from models import Dish, ModuleMenu, Order, OrderItem, OrderStatus, User
+
+    with main.SessionLocal() as db:
+        for is_provider in (True, False):
+            with open(MENU_FILE, "rb") as menu_file:
+                sync_menu(db, parse_menu_file(menu_file), is_provider)
+        db.commit()
+
+        dish_ids = [row.id for row in db.query(Dish.id).filter(Dish.is_active.is_(True))]
+        module_menu = {day: sorted(rng.sample(dish_ids, min(DISHES_PER_DAY, len(dish_ids)))) for day in range(5)}
+        db.add_all(ModuleMenu(day_of_week=day, dish_id=dish_id) for day, ids in module_menu.items() for dish_id in ids)
+
+        db.bulk_insert_mappings(User, [
+            {
+                "name": f"User{i}",
+                "secondary_name": f"Load{i}",
+                "email": f"load{i}@example.com",
+                "status": rng.choice(["student", "teacher", "staff"]),
+                "email_verified": True,
+            }
+            for i in range(users)
+        ])
+        db.commit()
+        user_ids = [row.id for row in db.query(User.id).filter(User.is_admin.is_(False)).order_by(User.id)]
+
+        for start in range(0, len(user_ids), 500):
+            for user_id in user_ids[start:start + 500]:
+                main.build_order(db, user_id, random_order(rng, module_menu, SEEDED_WEEK, items_per_order))
+            db.commit()
+
+        order_ids = [row.id for row in db.query(Order.id).order_by(Order.id)]
+        paid = set(rng.sample(order_ids, int(len(order_ids) * PAID_SHARE)))
+        db.execute(update(Order).where(Order.id.in_(paid)).values(status=OrderStatus.PAID))
+        db.commit()
+        report_stats.rebuild_daily_stats(db.connection())
+        db.commit()
+
+        admin_id = db.query(User.id).filter(User.is_admin.is_(True)).scalar()
+        pending = [
+            (row.id, row.user_id)
+            for row in db.query(Order.id, Order.user_id).filter(Order.status == OrderStatus.PENDING)
+        ]
+        item_count = db.query(func.count(OrderItem.id)).scalar()
+
+    return {
+        "admin_id": admin_id,
+        "user_ids": user_ids,
+        "module_menu": module_menu,
+        "pending_orders": pending,
+        "counts": {
+            "users": len(user_ids),
+            "dishes": len(dish_ids),
+            "orders": len(order_ids),
+            "paid_orders": len(paid),
+            "order_items": item_count,
+        },
+    }
+
+
+def random_order(rng: random.Random, module_menu: dict, week: date, items_per_order: int):
+    from schemas import OrderCreate
+
+    days = {day: [] for day in module_menu}
+    for _ in range(items_per_order):
+        day = rng.randrange(5)
+        days[day].append({"dish_id": rng.choice(module_menu[day]), "quantity": rng.randint(1, 2)})
+    return OrderCreate(
+        week_start_date=week,
+        days=[{"day_of_week": day, "items": items} for day, items in days.items() if items]
+    )
+
+
+def percentile(ordered, p: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+def registry_totals():
+    import metrics
+
+    # observed on the event loop thread, same as this harness
+    entries = list(metrics.registry.routes.values())
+    return (
+        sum(entry.queries.count for entry in entries),
+        sum(entry.queries.total for entry in entries),
+        sum(entry.db_seconds for entry in entries),
+    )
+
+
+def summarize(results, elapsed: float, concurrency: int, before, after) -> dict:
+    latencies = sorted(r[1] * 1000 for r in results)
+    statuses = Counter(str(r[0]) for r in results)
+    requests, queries, db_seconds = (a - b for a, b in zip(after, before))
+    return {
+        "requests": len(results),
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 1) if elapsed else None,
+        "errors": sum(count for status, count in statuses.items() if not status.startswith(("2", "3"))),
+        "status_counts": dict(sorted(statuses.items())),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 2) if latencies else None,
+            "p50": round(percentile(latencies, 50), 2),
+            "p90": round(percentile(latencies, 90), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(latencies[-1], 2) if latencies else None,
+        },
+        "queries_per_request": round(queries / requests, 2) if requests else None,
+        "db_ms_per_request": round(db_seconds * 1000 / requests, 3) if requests else None,
+    }
+
+
+async def drive(client, make_request, total: int, concurrency: int) -> dict:
+    results = []
+    indexes = iter(range(total))
+
+    async def worker():
+        for i in indexes:
+            method, url, kwargs = make_request(i)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            results.append((response.status_code, time.perf_counter() - started))
+
+    before = registry_totals()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(results, elapsed, concurrency, before, registry_totals())
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def run_scenarios(app, data: dict, names, total: int, concurrency: int, rng: random.Random) -> dict:
+    import httpx
+
+    from auth import create_access_token
+
+    tokens = {user_id: create_access_token({"sub": user_id}) for user_id in data["user_ids"]}
+    admin = bearer(create_access_token({"sub": data["admin_id"]}))
+    user_ids = data["user_ids"]
+    module_menu = data["module_menu"]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+        poll_urls = ["/menu", "/menu?is_provider=true", "/menu?type=MAIN", "/module-menu"]
+        etags = {}
+        for url in poll_urls:
+            response = await client.get(url, headers=bearer(tokens[user_ids[0]]))
+            etags[url] = response.headers.get("etag")
+
+        def monday_rush(i):
+            user_id = user_ids[i % len(user_ids)]
+            order = random_order(rng, module_menu, RUSH_WEEK, 10)
+            return "POST", "/orders", {"headers": bearer(tokens[user_id]), "json": order.model_dump(mode="json")}
+
+        def menu_polling(i):
+            url = poll_urls[i % len(poll_urls)]
+            headers = bearer(tokens[user_ids[i % len(user_ids)]])
+            if i % 2 and etags[url]:
+                headers["If-None-Match"] = etags[url]
+            return "GET", url, {"headers": headers}
+
+        def admin_reports(i):
+            day = date.fromordinal(SEEDED_WEEK.toordinal() + i % 5).isoformat()
+            kind = i % 3
+            if kind == 0:
+                return "GET", f"/admin/reports/summary?date_query={day}", {"headers": admin}
+            if kind == 1:
+                return "GET", f"/admin/reports/docx?date_query={day}", {"headers": admin}
+            return "GET", f"/admin/export/order-items?week_start_date={SEEDED_WEEK}", {"headers": admin}
+
+        pending = data["pending_orders"]
+
+        def payment_uploads(i):
+            order_id, user_id = pending[i % len(pending)]
+            # distinct bytes, so every upload is really written rather than deduplicated
+            proof = i.to_bytes(8, "big") + rng.randbytes(64 * 1024)
+            return "POST", f"/orders/{order_id}/pay", {
+                "headers": bearer(tokens[user_id]),
+                "files": {"file": (f"proof_{i}.jpg", proof, "image/jpeg")},
+            }
+
+        makers = {
+            "monday_rush": monday_rush,
+            "menu_polling": menu_polling,
+            "admin_reports": admin_reports,
+            "payment_uploads": payment_uploads,
+        }
+        return {name: await drive(client, makers[name], total, concurrency) for name in names}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--items-per-order", type=int, default=12)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="canteen-load-")
+    try:
+        database_url = prepare_environment(workdir)
+
+        started = time.perf_counter()
+        data = seed(database_url, args.users, args.items_per_order, rng)
+        seed_seconds = time.perf_counter() - started
+
+        import main as app_module
+
+        scenarios = asyncio.run(
+            run_scenarios(app_module.app, data, names, args.requests, args.concurrency, rng)
+        )
+    finally:
+        if args.keep:
+            print(f"scratch directory kept at {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "db_mode": os.getenv("DB_MODE", "sync"),
+        "seed": {"random_seed": args.seed, "seconds": round(seed_seconds, 2), **data["counts"]},
+        "scenarios": scenarios,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 from docx import Document
 from docx.shared import Cm, Pt
+import io
 import os
+import re
+import zipfile
+from xml.sax.saxutils import escape
 
 
-def generate_table_setting_report(orders_data, filename="table_report.docx"):
+def _new_document():
     document = Document()
 
     sections = document.sections
@@ -17,15 +21,93 @@ def generate_table_setting_report(orders_data, filename="table_report.docx"):
     font = style.font
     font.name = 'Times New Roman'
     font.size = Pt(11)
+    return document
 
-    for order in orders_data:
-        dishes_str = "+".join(order['dishes'])
-        line_text = f"{order['user_name']} {order['user_class']}\t{dishes_str}"
 
-        p = document.add_paragraph(line_text)
+def _line_text(order):
+    dishes_str = "+".join(order['dishes'])
+    return f"{order['user_name']} {order['user_class']}\t{dishes_str}"
+
+
+def generate_table_setting_report(orders_data, filename="table_report.docx", directory="reports", writer="xml"):
+    """writer="xml" streams the paragraphs straight into the zip, "python-docx" builds them one object at a time."""
+    os.makedirs(directory, exist_ok=True)
+    file_path = os.path.join(directory, filename)
+
+    if writer == "xml":
+        write_report_xml(orders_data, file_path)
+        return file_path
+
+    document = _new_document()
+
+    for order in orders_data:
+        p = document.add_paragraph(_line_text(order))
         p.paragraph_format.space_after = Pt(0)
 
-    os.makedirs("reports", exist_ok=True)
-    file_path = os.path.join("reports", filename)
     document.save(file_path)
-    return file_path
\ No newline at end of file
+    return file_path
+
+
+# The fast writer: the same document python-docx produces, with the body written as text.
+
+DOCUMENT_PART = "word/document.xml"
+# characters XML 1.0 can't hold
+INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+WRITE_BUFFER_PARAGRAPHS = 1000
+
+_template = None
+
+
+def _load_template():
+    """Zip bytes and document.xml (split around the body content) of an empty report, built once."""
+    global _template
+    if _template is None:
+        buffer = io.BytesIO()
+        _new_document().save(buffer)
+        with zipfile.ZipFile(buffer) as archive:
+            document_xml = archive.read(DOCUMENT_PART).decode("utf-8")
+        split_at = document_xml.rindex("<w:sectPr")
+        _template = (buffer.getvalue(), document_xml[:split_at], document_xml[split_at:])
+    return _template
+
+
+def _run_text_xml(text):
+    text = escape(INVALID_XML_CHARS.sub("", text))
+    if text[:1].isspace() or text[-1:].isspace():
+        return f'<w:t xml:space="preserve">{text}</w:t>'
+    return f"<w:t>{text}</w:t>"
+
+
+def _paragraph_xml(line):
+    parts = []
+    for i, piece in enumerate(line.split("\t")):
+        if i:
+            parts.append("<w:tab/>")
+        for j, chunk in enumerate(piece.split("\n")):
+            if j:
+                parts.append("<w:br/>")
+            if chunk:
+                parts.append(_run_text_xml(chunk))
+    return '<w:p><w:pPr><w:spacing w:after="0"/></w:pPr><w:r>' + "".join(parts) + "</w:r></w:p>"
+
+
+def write_report_xml(orders_data, file_path):
+    template_zip, head, tail = _load_template()
+
+    with zipfile.ZipFile(io.BytesIO(template_zip)) as source, \
+            zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as target:
+        for info in source.infolist():
+            if info.filename != DOCUMENT_PART:
+                target.writestr(info, source.read(info.filename))
+                continue
+
+            with target.open(DOCUMENT_PART, "w") as body:
+                body.write(head.encode("utf-8"))
+                pending = []
+                for order in orders_data:
+                    pending.append(_paragraph_xml(_line_text(order)))
+                    if len(pending) >= WRITE_BUFFER_PARAGRAPHS:
+                        body.write("".join(pending).encode("utf-8"))
+                        pending = []
+                body.write("".join(pending).encode("utf-8"))
+                body.write(tail.encode("utf-8"))
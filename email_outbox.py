@@ -0,0 +1,398 @@
+import asyncio
+import logging
+import os
+import random
+import smtplib
+import ssl
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from models import EmailStatus, OutboxEmail
+
+
+logger = logging.getLogger(__name__)
+
+# without a host, mail is written to the log instead of being sent
+SMTP_HOST = os.getenv("SMTP_HOST", "")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_FROM = os.getenv("SMTP_FROM", SMTP_USER or "canteen@localhost")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+# connections kept open between batches, and batch slices sent in parallel
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+# servers drop idle sessions; older ones are reopened rather than reused
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "30"))
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "10"))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "900"))
+# a claim older than this is taken to belong to a dead worker; keep it well above
+# batch size / pool size * SMTP_TIMEOUT, or a slow live batch gets sent twice
+OUTBOX_CLAIM_LEASE_SECONDS = float(os.getenv("OUTBOX_CLAIM_LEASE_SECONDS", "600"))
+
+
+class OutgoingEmail(NamedTuple):
+    id: int
+    to_email: str
+    subject: str
+    body: str
+    attempts: int
+
+
+Result = Tuple[OutgoingEmail, Optional[Exception]]
+
+
+def enqueue(session: Session, to_email: str, subject: str, body: str) -> OutboxEmail:
+    """Adds a mail to the outbox; it goes out once the caller commits and the dispatcher picks it up."""
+    email = OutboxEmail(to_email=to_email, subject=subject, body=body, status=EmailStatus.PENDING)
+    session.add(email)
+    return email
+
+
+def backoff_delay(attempts: int) -> float:
+    delay = min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def is_permanent(error: Exception) -> bool:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+def claim_batch(session: Session, limit: int, claim_token: str) -> List[OutgoingEmail]:
+    """Moves up to limit due mails from PENDING to SENDING under claim_token and returns them.
+
+    Another worker may claim some of the same candidates first; the UPDATE
+    only takes rows still PENDING, and only rows carrying our token come back.
+    """
+    now = datetime.utcnow()
+    candidate_ids = [
+        row.id for row in session.query(OutboxEmail.id).filter(
+            OutboxEmail.status == EmailStatus.PENDING,
+            OutboxEmail.next_attempt_at <= now
+        ).order_by(OutboxEmail.next_attempt_at, OutboxEmail.id).limit(limit)
+    ]
+    if not candidate_ids:
+        return []
+
+    session.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.id.in_(candidate_ids), OutboxEmail.status == EmailStatus.PENDING)
+        .values(status=EmailStatus.SENDING, claim_token=claim_token, claimed_at=now)
+    )
+    session.commit()
+
+    rows = session.query(
+        OutboxEmail.id, OutboxEmail.to_email, OutboxEmail.subject, OutboxEmail.body, OutboxEmail.attempts
+    ).filter(
+        OutboxEmail.claim_token == claim_token,
+        OutboxEmail.status == EmailStatus.SENDING
+    ).order_by(OutboxEmail.id).all()
+    return [OutgoingEmail(*row) for row in rows]
+
+
+def record_results(session: Session, results: Sequence[Result], claim_token: str) -> None:
+    now = datetime.utcnow()
+    # a claim that outlived its lease may have been released and re-claimed elsewhere
+    ours = OutboxEmail.claim_token == claim_token
+
+    sent_ids = [email.id for email, error in results if error is None]
+    if sent_ids:
+        session.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.id.in_(sent_ids), ours)
+            .values(status=EmailStatus.SENT, sent_at=now, last_error=None, claim_token=None)
+        )
+
+    for email, error in results:
+        if error is None:
+            continue
+        attempts = email.attempts + 1
+        give_up = is_permanent(error) or attempts >= OUTBOX_MAX_ATTEMPTS
+        session.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.id == email.id, ours)
+            .values(
+                status=EmailStatus.FAILED if give_up else EmailStatus.PENDING,
+                claim_token=None,
+                attempts=attempts,
+                next_attempt_at=now + timedelta(seconds=0 if give_up else backoff_delay(attempts)),
+                last_error=f"{type(error).__name__}: {error}"[:500]
+            )
+        )
+        if give_up:
+            logger.warning("Giving up on email %s after %s attempts: %s", email.id, attempts, type(error).__name__)
+
+    session.commit()
+
+
+def release_claims(session: Session, claim_token: Optional[str] = None) -> None:
+    """Puts claimed mail back in the queue: one batch of ours, or else every claim whose lease ran out.
+
+    Claims of other live workers are left alone, so several processes can
+    share one outbox.
+    """
+    if claim_token is not None:
+        claimed = OutboxEmail.claim_token == claim_token
+    else:
+        claimed = OutboxEmail.claimed_at < datetime.utcnow() - timedelta(seconds=OUTBOX_CLAIM_LEASE_SECONDS)
+    session.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.status == EmailStatus.SENDING, claimed)
+        .values(status=EmailStatus.PENDING, claim_token=None)
+    )
+    session.commit()
+
+
+def build_message(email: OutgoingEmail, sender: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = email.to_email
+    message["Subject"] = email.subject
+    message.set_content(email.body)
+    return message
+
+
+class SMTPPool:
+    """Up to size logged-in SMTP connections, kept open between batches."""
+
+    def __init__(
+            self,
+            host: str = SMTP_HOST,
+            port: int = SMTP_PORT,
+            user: str = SMTP_USER,
+            password: str = SMTP_PASSWORD,
+            starttls: bool = SMTP_STARTTLS,
+            size: int = SMTP_POOL_SIZE,
+            timeout: float = SMTP_TIMEOUT,
+            idle_seconds: float = SMTP_IDLE_SECONDS
+    ):
+        self.host, self.port, self.user, self.password = host, port, user, password
+        self.starttls = starttls
+        self.size = size
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self._idle: List[Tuple[smtplib.SMTP, float]] = []
+        self._lock = threading.Lock()
+
+    def connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.starttls:
+                smtp.starttls(context=ssl.create_default_context())
+                smtp.ehlo()
+            if self.user:
+                smtp.login(self.user, self.password)
+        except BaseException:
+            smtp.close()
+            raise
+        return smtp
+
+    def acquire(self) -> smtplib.SMTP:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                smtp, released_at = self._idle.pop()
+            if time.monotonic() - released_at < self.idle_seconds and self._alive(smtp):
+                return smtp
+            self._quit(smtp)
+        return self.connect()
+
+    def release(self, smtp: smtplib.SMTP, broken: bool = False) -> None:
+        if not broken:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append((smtp, time.monotonic()))
+                    return
+        self._quit(smtp)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for smtp, _ in idle:
+            self._quit(smtp)
+
+    @staticmethod
+    def _alive(smtp: smtplib.SMTP) -> bool:
+        try:
+            return smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _quit(smtp: smtplib.SMTP) -> None:
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+
+class SMTPTransport:
+    def __init__(self, pool: SMTPPool, sender: str = SMTP_FROM):
+        self.pool = pool
+        self.sender = sender
+
+    def send(self, emails: Sequence[OutgoingEmail]) -> List[Result]:
+        """Sends emails over one pooled connection; a dropped connection fails the rest of the slice."""
+        results = []
+        try:
+            smtp = self.pool.acquire()
+        except (smtplib.SMTPException, OSError) as e:
+            return [(email, e) for email in emails]
+
+        broken, error = False, None
+        for email in emails:
+            if broken:
+                results.append((email, error))
+                continue
+            try:
+                smtp.send_message(build_message(email, self.sender))
+                results.append((email, None))
+            except smtplib.SMTPServerDisconnected as e:
+                broken, error = True, e
+                results.append((email, e))
+            except smtplib.SMTPException as e:
+                # the server refused this message; the session is still usable
+                results.append((email, e))
+            except OSError as e:
+                broken, error = True, e
+                results.append((email, e))
+            except Exception as e:
+                results.append((email, e))
+
+        self.pool.release(smtp, broken)
+        return results
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+class LogTransport:
+    """Stand-in used when SMTP_HOST is not set."""
+
+    def send(self, emails: Sequence[OutgoingEmail]) -> List[Result]:
+        for email in emails:
+            logger.info("Email simulation: %s", email.subject, extra={"email": email.to_email})
+            logger.debug("Email simulation: body for %s: %s", email.to_email, email.body)
+        return [(email, None) for email in emails]
+
+    def close(self) -> None:
+        pass
+
+
+def make_transport():
+    if not SMTP_HOST:
+        return LogTransport()
+    return SMTPTransport(SMTPPool())
+
+
+class EmailDispatcher:
+    """Background task draining the outbox in batches.
+
+    Database and SMTP work runs on the dispatcher's own threads, so slow mail
+    servers never hold the request threadpool. Mails are picked up on wake()
+    and, as a fallback, every poll_seconds.
+    """
+
+    def __init__(
+            self,
+            session_factory: Callable[[], Session],
+            transport,
+            batch_size: int = OUTBOX_BATCH_SIZE,
+            poll_seconds: float = OUTBOX_POLL_SECONDS,
+            workers: int = SMTP_POOL_SIZE
+    ):
+        self.session_factory = session_factory
+        self.transport = transport
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.workers = max(1, workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="outbox")
+        self._task = self._loop.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._executor.shutdown(wait=True)
+        self.transport.close()
+
+    def wake(self) -> None:
+        """Safe to call from any thread, after the transaction that enqueued mail has committed."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _in_thread(self, fn, *args):
+        return await self._loop.run_in_executor(self._executor, fn, *args)
+
+    def _with_session(self, fn, *args):
+        with self.session_factory() as session:
+            return fn(session, *args)
+
+    async def dispatch_once(self) -> int:
+        claim_token = uuid.uuid4().hex
+        batch = await self._in_thread(self._with_session, claim_batch, self.batch_size, claim_token)
+        if not batch:
+            return 0
+
+        try:
+            slices = [batch[i::self.workers] for i in range(self.workers) if batch[i::self.workers]]
+            sent = await asyncio.gather(*(self._in_thread(self.transport.send, part) for part in slices))
+        except Exception:
+            await self._in_thread(self._with_session, release_claims, claim_token)
+            raise
+
+        results = [result for part in sent for result in part]
+        await self._in_thread(self._with_session, record_results, results, claim_token)
+        return len(batch)
+
+    async def release_expired_claims(self) -> None:
+        # a locked or unreachable database must not end the dispatcher task
+        try:
+            await self._in_thread(self._with_session, release_claims)
+        except Exception:
+            logger.exception("Releasing expired outbox claims failed")
+
+    async def run(self) -> None:
+        await self.release_expired_claims()
+        while True:
+            self._wake.clear()
+            try:
+                claimed = await self.dispatch_once()
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+                claimed = 0
+            if claimed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                await self.release_expired_claims()
@@ -0,0 +1,67 @@
+import csv
+import json
+from typing import Callable, Iterable, Iterator, Sequence
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Query, Session
+
+from database import SessionLocal
+
+
+EXPORT_BATCH_SIZE = 500
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class _Echo:
+    """File-like object for csv.writer that hands each formatted row back instead of storing it."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def iter_query_rows(build_query: Callable[[Session], Query]) -> Iterator[tuple]:
+    """Runs the query in its own session, which lives as long as the response is being streamed."""
+    session = SessionLocal()
+    try:
+        for row in build_query(session).yield_per(EXPORT_BATCH_SIZE):
+            yield tuple(row)
+    finally:
+        session.close()
+
+
+def iter_csv(header: Sequence[str], rows: Iterable[Sequence]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow(row))
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def iter_ndjson(header: Sequence[str], rows: Iterable[Sequence]) -> Iterator[str]:
+    batch = []
+    for row in rows:
+        batch.append(json.dumps(dict(zip(header, row)), ensure_ascii=False, default=str) + "\n")
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def streaming_export(name: str, header: Sequence[str], rows: Iterable[Sequence], fmt: str = "csv") -> StreamingResponse:
+    content = iter_csv(header, rows) if fmt == "csv" else iter_ndjson(header, rows)
+    return StreamingResponse(
+        content,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename={name}.{fmt}"}
+    )
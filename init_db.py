@@ -1,13 +1,14 @@
 from __future__ import annotations
 
-from sqlalchemy import create_engine
-
+from database import DATABASE_URL, make_engine
+from migrations import run_migrations
 from models import Base
 
 
-def init_db(database_url: str = "sqlite:///./app.db") -> None:
-    engine = create_engine(database_url, echo=True)
+def init_db(database_url: str = DATABASE_URL) -> None:
+    engine = make_engine(database_url, echo=True)
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
 
     from dotenv import load_dotenv
 
@@ -49,5 +50,5 @@ def init_db(database_url: str = "sqlite:///./app.db") -> None:
 if __name__ == "__main__":
     import sys
 
-    database_url = sys.argv[1] if len(sys.argv) > 1 else "sqlite:///./app.db"
+    database_url = sys.argv[1] if len(sys.argv) > 1 else DATABASE_URL
     init_db(database_url)
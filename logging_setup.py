@@ -0,0 +1,154 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# per-module overrides, e.g. "auth=DEBUG,sqlalchemy.engine=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# "json" for log collectors, "text" for a terminal
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+
+REQUEST_ID_HEADER = b"x-request-id"
+VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# bearer credentials and anything shaped like a JWT
+SECRET_PATTERN = re.compile(r"(?i)(bearer\s+)[\w.~+/=-]{16,}|\beyJ[\w-]*\.[\w-]+\.[\w-]*")
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# attributes every LogRecord has; anything else came in through extra=
+RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "request_id"}
+
+_listener: Optional[QueueListener] = None
+
+
+def redact(text: str) -> str:
+    return SECRET_PATTERN.sub(lambda m: (m.group(1) or "") + "[redacted]", text)
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for part in spec.split(","):
+        name, sep, level = part.partition("=")
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact(record.getMessage()),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in RECORD_FIELDS:
+                entry[key] = redact(value) if isinstance(value, str) else value
+        if record.exc_info:
+            entry["exc"] = redact(self.formatException(record.exc_info))
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = None
+        return redact(super().format(record))
+
+
+class RequestQueueHandler(QueueHandler):
+    """Hands records to the listener thread untouched.
+
+    The stock prepare() formats the message in the calling thread; here that
+    work is left to the listener, and only the request id, which lives in the
+    caller's context, is captured up front.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        return record
+
+
+def configure_logging(level: str = LOG_LEVEL, levels: str = LOG_LEVELS, stream=None) -> QueueListener:
+    """Routes the root logger through a queue drained by a background thread; safe to call twice."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    sink = logging.StreamHandler(stream or sys.stderr)
+    sink.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(RequestQueueHandler(records))
+    root.setLevel(level)
+    for name, module_level in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = QueueListener(records, sink, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """Flushes whatever is still queued; the listener thread stops afterwards."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """Tags every request with an id (the caller's X-Request-ID when it looks sane) for logs and the response."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        scope.setdefault("state", {})["request_id"] = request_id
+        header = (REQUEST_ID_HEADER, request_id.encode("latin-1"))
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), header]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
@@ -1,63 +1,92 @@
+import asyncio
 import random
 import string
 import os
-import csv
-import io
+import json
+from contextlib import asynccontextmanager
 from datetime import date
-from typing import List, Dict
+from typing import List, Dict, Literal, Optional
 
 from dotenv import load_dotenv
 
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 
 load_dotenv()
 
 import uvicorn
-from fastapi import Depends, FastAPI, File, HTTPException, Request, UploadFile, status
+from fastapi import Depends, FastAPI, File, HTTPException, Query, Request, Response, UploadFile, status
 from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-
-from auth import JWTAuthMiddleware, create_access_token, require_admin, get_current_user_id
-from menu_parser import parse_menu_text
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import insert, update
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+
+from auth import JWTAuthMiddleware, create_access_token, require_admin, get_current_user_id, load_user
+from menu_parser import iter_batches, parse_menu_file
+from menu_sync import SYNC_BATCH_SIZE, MenuSync, read_menu_batch
 from models import (
     Dish, DishType, User, ModuleMenu, Order, OrderItem, OrderStatus,
-    Base
+    DailyDishStat, Base
 )
 from schemas import (
     DishCreate, DishResponse, DishUpdate, RegisterResponse, UserCreate,
     UserResponse, VerifyCodeRequest, VerifyCodeResponse, ResendCodeRequest,
     ResendCodeResponse, AdminUpdateRequest, ModuleMenuRequest,
-    OrderCreate, OrderResponse, DishBase
+    OrderCreate, OrderResponse, DishBase, OrderDetailResponse, OrderDayDetail,
+    OrderItemDetail, BulkOrderStatusRequest, BulkOrderStatusResponse, BulkOrderStatusResult
 )
-import docx_utils
+import email_outbox
+import exports
+import menu_cache
+import metrics
+import rate_limit
+import report_jobs
+import report_stats
+import uploads
+
+from logging_setup import RequestIdMiddleware, configure_logging
+from database import SessionLocal, async_engine, engine, get_async_db, get_db, run_db
+from migrations import run_migrations
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from fastapi.security import HTTPBearer
+from pydantic import TypeAdapter
 
 
-engine = create_engine("sqlite:///./app.db", connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+configure_logging()
 
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
-
-def get_db() -> Session:
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+if metrics.METRICS_ENABLED:
+    metrics.instrument_engine(engine)
+    if async_engine is not None:
+        metrics.instrument_engine(async_engine.sync_engine)
 
 
 security_scheme = HTTPBearer(auto_error=False)
 
+email_dispatcher = email_outbox.EmailDispatcher(SessionLocal, email_outbox.make_transport())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    email_dispatcher.start()
+    yield
+    await email_dispatcher.stop()
+    report_jobs.shutdown()
+
+
 app = FastAPI(
     title="Canteen API",
-    dependencies=[Depends(security_scheme)]
+    dependencies=[Depends(security_scheme)],
+    lifespan=lifespan
 )
 app.add_middleware(JWTAuthMiddleware)
+app.add_middleware(uploads.UploadSizeLimitMiddleware)
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+# added last so it wraps auth and its log lines carry the request id
+app.add_middleware(RequestIdMiddleware)
 
 
 
@@ -66,10 +95,8 @@ def get_admin_user(request: Request, db: Session = Depends(get_db)) -> User:
 
 
 def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
-    a = request.items()
-    print(a)
     user_id = get_current_user_id(request)
-    user = db.query(User).filter(User.id == user_id).first()
+    user = load_user(db, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
@@ -79,12 +106,22 @@ def generate_verification_code() -> str:
     return ''.join(random.choices(string.digits, k=6))
 
 
-def send_verification_email(to_email: str, code: str) -> None:
-    print(f"--- EMAIL SIMULATION: Code for {to_email} is {code} ---")
-    pass
+def queue_verification_email(db: Session, to_email: str, code: str) -> None:
+    """Writes the mail to the outbox; call email_dispatcher.wake() once db has committed."""
+    email_outbox.enqueue(
+        db,
+        to_email,
+        subject="Canteen verification code",
+        body=f"Your verification code is {code}"
+    )
 
 
-@app.post("/register", response_model=RegisterResponse, status_code=status.HTTP_201_CREATED)
+@app.post(
+    "/register",
+    response_model=RegisterResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(rate_limit.limit("register"))]
+)
 def register(user_data: UserCreate, db: Session = Depends(get_db)):
     existing = db.query(User).filter(User.email == user_data.email).first()
     if existing and existing.email_verified:
@@ -93,7 +130,9 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     code = generate_verification_code()
     if existing:
         existing.verification_code = code
+        queue_verification_email(db, existing.email, code)
         db.commit()
+        email_dispatcher.wake()
         return RegisterResponse(message="Code resent", user=UserResponse.model_validate(existing))
 
     new_user = User(
@@ -104,9 +143,10 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         verification_code=code
     )
     db.add(new_user)
+    queue_verification_email(db, new_user.email, code)
     db.commit()
     db.refresh(new_user)
-    send_verification_email(new_user.email, code)
+    email_dispatcher.wake()
     return RegisterResponse(message="Registered", user=UserResponse.model_validate(new_user))
 
 @app.get("/users/me", response_model=UserResponse)
@@ -114,7 +154,11 @@ def read_users_me(current_user: User = Depends(get_current_user)):
 
     return current_user
 
-@app.post("/verify-code", response_model=VerifyCodeResponse)
+@app.post(
+    "/verify-code",
+    response_model=VerifyCodeResponse,
+    dependencies=[Depends(rate_limit.limit("verify-code"))]
+)
 def verify_code(data: VerifyCodeRequest, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == data.email).first()
     if not user or user.verification_code != data.code:
@@ -127,10 +171,48 @@ def verify_code(data: VerifyCodeRequest, db: Session = Depends(get_db)):
     return VerifyCodeResponse(access_token=token, token_type="bearer", user=UserResponse.model_validate(user))
 
 
+@app.post(
+    "/resend-code",
+    response_model=ResendCodeResponse,
+    dependencies=[Depends(rate_limit.limit("resend-code"))]
+)
+def resend_code(data: ResendCodeRequest, db: Session = Depends(get_db)):
+    user = db.query(User).filter(User.email == data.email).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if user.email_verified:
+        raise HTTPException(status_code=400, detail="Email already verified")
+
+    code = generate_verification_code()
+    user.verification_code = code
+    queue_verification_email(db, user.email, code)
+    db.commit()
+    email_dispatcher.wake()
+    return ResendCodeResponse(message="Code resent")
+
+
+
+dish_list_adapter = TypeAdapter(List[DishResponse])
+
 
 @app.get("/menu", response_model=List[DishResponse])
-def get_global_menu(db: Session = Depends(get_db)):
-    return db.query(Dish).all()
+def get_global_menu(
+        request: Request,
+        type: Optional[DishType] = None,
+        is_provider: Optional[bool] = None,
+        db: Session = Depends(get_db)
+):
+    def build() -> bytes:
+        query = db.query(Dish).filter(Dish.is_active.is_(True))
+        if is_provider is not None:
+            query = query.filter(Dish.is_provider == is_provider)
+        if type is not None:
+            query = query.filter(Dish.type == type)
+        dishes = dish_list_adapter.validate_python(query.all(), from_attributes=True)
+        return dish_list_adapter.dump_json(dishes)
+
+    key = f"menu:{type.value if type else ''}:{'' if is_provider is None else int(is_provider)}"
+    return menu_cache.cached_json_response(request, key, build)
 
 
 @app.post("/menu/dish", response_model=DishResponse)
@@ -138,6 +220,7 @@ def create_dish(dish: DishCreate, db: Session = Depends(get_db), admin: User = D
     new_dish = Dish(**dish.model_dump())
     db.add(new_dish)
     db.commit()
+    menu_cache.invalidate()
     db.refresh(new_dish)
     return new_dish
 
@@ -146,54 +229,48 @@ def create_dish(dish: DishCreate, db: Session = Depends(get_db), admin: User = D
 async def upload_menu_file(
     file: UploadFile = File(...),
     is_provider: bool = True,
-    db: Session = Depends(get_db),
+    db=Depends(get_async_db),
     admin: User = Depends(get_admin_user)
 ):
-    content = await file.read()
-    try:
-        content_str = content.decode("utf-8")
-    except UnicodeDecodeError:
+    # one batch in memory at a time: parsed in the threadpool, then written
+    batches = iter_batches(parse_menu_file(file.file), SYNC_BATCH_SIZE)
+    menu = MenuSync(is_provider)
+
+    async def next_batch() -> Optional[list]:
         try:
-            content_str = content.decode("cp1251")
+            return await run_in_threadpool(read_menu_batch, batches)
         except UnicodeDecodeError:
             raise HTTPException(status_code=400, detail="Invalid file encoding. Please use UTF-8.")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error parsing file: {e}")
 
     try:
-        dishes_data = parse_menu_text(content_str)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error parsing file: {e}")
-
-    if not dishes_data:
-        raise HTTPException(status_code=400, detail="No dishes found in the file.")
-
-
-    db.query(Dish).filter(Dish.is_provider == is_provider).delete(synchronize_session=False)
-
-    new_dishes = []
-    for item in dishes_data:
-        dish = Dish(
-            name=item.name,
-            type=item.type,
-            composition=item.composition,
-            quantity_grams=item.quantity_grams,
-            price_rub=item.price_rub,
-            is_provider=is_provider
-        )
-        db.add(dish)
-        new_dishes.append(dish)
-
-    try:
-        db.commit()
-    except Exception as e:
-        db.rollback()
+        await run_db(db, menu.load)
+        while (batch := await next_batch()) is not None:
+            await run_db(db, menu.apply, batch)
+
+        if not menu.seen:
+            raise HTTPException(status_code=400, detail="No dishes found in the file.")
+        summary = await run_db(db, menu.finish)
+        await run_db(db, Session.commit)
+    except HTTPException:
+        await run_db(db, Session.rollback)
+        raise
+    except SQLAlchemyError as e:
+        await run_db(db, Session.rollback)
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
+    if summary["added"] or summary["updated"] or summary["retired"]:
+        menu_cache.invalidate()
+
     return {
         "message": "Menu updated successfully",
-        "deleted_old": True,
-        "added_new": len(new_dishes),
+        "added_new": summary["added"],
+        "updated": summary["updated"],
+        "unchanged": summary["unchanged"],
+        "retired": summary["retired"],
         "menu_type": "Provider" if is_provider else "Own Kitchen"
     }
 
@@ -227,54 +304,97 @@ def set_module_menu(
             db.add(mm)
 
     db.commit()
+    menu_cache.invalidate()
     return {"message": "Module menu saved successfully"}
 
 
 @app.get("/module-menu")
-def get_module_menu(db: Session = Depends(get_db)):
-    menu_items = db.query(ModuleMenu).all()
-    return menu_items
+def get_module_menu(request: Request, db: Session = Depends(get_db)):
+    def build() -> bytes:
+        rows = db.query(ModuleMenu.id, ModuleMenu.day_of_week, ModuleMenu.dish_id).all()
+        return json.dumps(
+            [{"id": r.id, "day_of_week": r.day_of_week, "dish_id": r.dish_id} for r in rows]
+        ).encode()
+
+    return menu_cache.cached_json_response(request, "module-menu", build)
+
+
+
+def build_order(db: Session, user_id: int, order_data: OrderCreate) -> Order:
+    requested = [
+        (day_req.day_of_week, item)
+        for day_req in order_data.days
+        for item in day_req.items
+        if item.quantity > 0
+    ]
+
+    dish_ids = {item.dish_id for _, item in requested}
+    dishes = {}
+    if dish_ids:
+        dishes = {
+            d.id: d for d in
+            db.query(Dish.id, Dish.name, Dish.short_name, Dish.price_rub)
+            .filter(Dish.id.in_(dish_ids), Dish.is_active.is_(True))
+        }
 
+    total_price = 0.0
+    rows = []
+    for day_idx, item in requested:
+        dish = dishes.get(item.dish_id)
+        if dish is None: continue
+
+        total_price += dish.price_rub * item.quantity
+        rows.append({
+            "dish_id": item.dish_id,
+            "day_of_week": day_idx,
+            "quantity": item.quantity,
+            "unit_price": dish.price_rub,
+            "dish_name": dish.name,
+            "dish_short_name": dish.short_name
+        })
+
+    new_order = Order(
+        user_id=user_id,
+        week_start_date=order_data.week_start_date,
+        status=OrderStatus.PENDING,
+        total_amount=total_price
+    )
+    db.add(new_order)
+    db.flush()
+
+    if rows:
+        for row in rows:
+            row["order_id"] = new_order.id
+        db.execute(insert(OrderItem), rows)
+
+    return new_order
 
 
 @app.post("/orders", response_model=OrderResponse)
-def create_order(
+async def create_order(
         order_data: OrderCreate,
         request: Request,
-        db: Session = Depends(get_db)
+        db=Depends(get_async_db)
 ):
-    user = get_current_user(request, db)
+    def place(session: Session) -> Order:
+        user = get_current_user(request, session)
 
-    total_price = 0.0
-    new_order = Order(
-        user_id=user.id,
-        week_start_date=order_data.week_start_date,
-        status=OrderStatus.PENDING
-    )
-    db.add(new_order)
-    db.flush()
+        new_order = build_order(session, user.id, order_data)
+        session.commit()
+        session.refresh(new_order)
+        return new_order
 
-    for day_req in order_data.days:
-        for item in day_req.items:
-            if item.quantity > 0:
-                dish = db.query(Dish).filter(Dish.id == item.dish_id).first()
-                if not dish: continue
+    return await run_db(db, place)
 
-                cost = dish.price_rub * item.quantity
-                total_price += cost
 
-                order_item = OrderItem(
-                    order_id=new_order.id,
-                    dish_id=dish.id,
-                    day_of_week=day_req.day_of_week,
-                    quantity=item.quantity
-                )
-                db.add(order_item)
+def find_user_order(session: Session, request: Request, order_id: int) -> Order:
+    user = get_current_user(request, session)
+    order = session.query(Order).filter(Order.id == order_id, Order.user_id == user.id).first()
 
-    new_order.total_amount = total_price
-    db.commit()
-    db.refresh(new_order)
-    return new_order
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    return order
 
 
 @app.post("/orders/{order_id}/pay")
@@ -282,41 +402,77 @@ async def pay_order(
         order_id: int,
         request: Request,
         file: UploadFile = File(...),
-        db: Session = Depends(get_db)
+        db=Depends(get_async_db)
 ):
-    user = get_current_user(request, db)
-    order = db.query(Order).filter(Order.id == order_id, Order.user_id == user.id).first()
+    order = await run_db(db, find_user_order, request, order_id)
 
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
+    file_location = await uploads.save_upload(file)
 
-    os.makedirs("uploads", exist_ok=True)
-    file_location = f"uploads/{order_id}_{file.filename}"
-    with open(file_location, "wb+") as file_object:
-        file_object.write(await file.read())
+    def attach_proof(session: Session) -> None:
+        order.payment_proof_path = file_location
+        session.commit()
 
-    order.payment_proof_path = file_location
-
-    db.commit()
+    await run_db(db, attach_proof)
     return {"message": "Payment proof uploaded"}
 
 
 @app.get("/orders", response_model=List[OrderResponse])
-def get_my_orders(request: Request, db: Session = Depends(get_db)):
-    user = get_current_user(request, db)
-    orders = db.query(Order).filter(Order.user_id == user.id).order_by(Order.id.desc()).all()
+async def get_my_orders(
+        request: Request,
+        response: Response,
+        limit: int = Query(50, ge=1, le=200),
+        cursor: Optional[int] = Query(None, description="X-Next-Cursor of the previous page"),
+        db=Depends(get_async_db)
+):
+    def load(session: Session):
+        user = get_current_user(request, session)
+        query = session.query(Order.id, Order.status, Order.total_amount, Order.week_start_date) \
+            .filter(Order.user_id == user.id)
+        if cursor is not None:
+            query = query.filter(Order.id < cursor)
+        return query.order_by(Order.id.desc()).limit(limit + 1).all()
+
+    orders = await run_db(db, load)
+    if len(orders) > limit:
+        orders = orders[:limit]
+        response.headers["X-Next-Cursor"] = str(orders[-1].id)
     return orders
 
 
-@app.get("/orders/{order_id}", response_model=OrderResponse)
-def get_order_details(order_id: int, request: Request, db: Session = Depends(get_db)):
-    user = get_current_user(request, db)
-    order = db.query(Order).filter(Order.id == order_id, Order.user_id == user.id).first()
-
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
+@app.get("/orders/{order_id}", response_model=OrderDetailResponse)
+async def get_order_details(order_id: int, request: Request, db=Depends(get_async_db)):
+    def load(session: Session) -> OrderDetailResponse:
+        user = get_current_user(request, session)
+        order = session.query(Order) \
+            .options(selectinload(Order.items).joinedload(OrderItem.dish)) \
+            .filter(Order.id == order_id, Order.user_id == user.id) \
+            .first()
+
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+
+        days = {}
+        for it in sorted(order.items, key=lambda it: (it.day_of_week, it.id)):
+            dish = it.dish
+            days.setdefault(it.day_of_week, []).append(OrderItemDetail(
+                id=it.id,
+                dish_id=it.dish_id,
+                dish_name=it.dish_name or (dish.name if dish else None),
+                dish_type=dish.type if dish else None,
+                unit_price=it.unit_price if it.unit_price is not None else (dish.price_rub if dish else None),
+                quantity=it.quantity
+            ))
+
+        return OrderDetailResponse(
+            id=order.id,
+            status=order.status,
+            total_amount=order.total_amount,
+            week_start_date=order.week_start_date,
+            created_at=order.created_at,
+            days=[OrderDayDetail(day_of_week=day, items=items) for day, items in days.items()]
+        )
 
-    return order
+    return await run_db(db, load)
 
 
 @app.patch("/admin/orders/{order_id}/status")
@@ -328,98 +484,214 @@ def update_order_status(
 ):
     order = db.query(Order).filter(Order.id == order_id).first()
     if not order: raise HTTPException(404, "Order not found")
-    order.status = status
+
+    set_orders_status(db, {order.id: order.status}, status)
     db.commit()
     return {"message": f"Order marked as {status}"}
 
 
-@app.get("/admin/reports/docx")
-def download_table_report(date_query: date, db: Session = Depends(get_db), admin: User = Depends(get_admin_user)):
-    day_idx = date_query.weekday()
-
-    items = db.query(OrderItem).join(Order).join(User).join(Dish) \
-        .filter(OrderItem.day_of_week == day_idx) \
-        .filter(Order.status == OrderStatus.PAID) \
-        .all()
-
-    user_map = {}
-    for it in items:
-        uid = it.order.user_id
-        if uid not in user_map:
-            user_map[uid] = {
-                "user_name": f"{it.order.user.name} {it.order.user.secondary_name}",
-                "user_class": it.order.user.status,
-                "dishes": []
-            }
+def set_orders_status(db: Session, current: Dict[int, OrderStatus], status: OrderStatus) -> List[int]:
+    """One UPDATE per previous status, then one daily stats adjustment for the orders it really changed.
+
+    current is what the caller read earlier. Each UPDATE only matches orders
+    still in that status, so when two admins race, only one of them moves an
+    order and adjusts the stats for it.
+    """
+    by_old: Dict[OrderStatus, List[int]] = {}
+    for order_id, old in current.items():
+        if old != status:
+            by_old.setdefault(old, []).append(order_id)
+
+    changed = []
+    for old, order_ids in by_old.items():
+        moved = _move_orders(db, order_ids, old, status)
+        changed.extend(moved)
+        if moved and status == OrderStatus.PAID:
+            report_stats.apply_order_stats(db, moved, 1)
+        elif moved and old == OrderStatus.PAID:
+            report_stats.apply_order_stats(db, moved, -1)
+    return changed
+
+
+def _move_orders(db: Session, order_ids: List[int], old: OrderStatus, status: OrderStatus) -> List[int]:
+    """Sets status on the given orders that are still in old; returns the ids it updated."""
+    stmt = update(Order).where(Order.id.in_(order_ids), Order.status == old).values(status=status)
+    if db.get_bind().dialect.update_returning:
+        result = db.execute(stmt.returning(Order.id), execution_options={"synchronize_session": "fetch"})
+        return list(result.scalars())
+
+    moved = []
+    for order_id in order_ids:
+        result = db.execute(
+            update(Order).where(Order.id == order_id, Order.status == old).values(status=status),
+            execution_options={"synchronize_session": "fetch"}
+        )
+        if result.rowcount:
+            moved.append(order_id)
+    return moved
 
-        d_name = it.dish.short_name if it.dish.short_name else it.dish.name
 
-        for _ in range(it.quantity):
-            user_map[uid]["dishes"].append(d_name)
+@app.patch("/admin/orders/status", response_model=BulkOrderStatusResponse)
+def update_orders_status_bulk(
+        data: BulkOrderStatusRequest,
+        db: Session = Depends(get_db),
+        admin: User = Depends(get_admin_user)
+):
+    if data.order_ids is None and data.week_start_date is None:
+        raise HTTPException(status_code=400, detail="Pass order_ids or week_start_date")
+
+    query = db.query(Order.id, Order.status)
+    if data.order_ids is not None:
+        query = query.filter(Order.id.in_(data.order_ids))
+    if data.week_start_date is not None:
+        query = query.filter(Order.week_start_date == data.week_start_date)
+    if data.has_payment_proof is not None:
+        proof = Order.payment_proof_path
+        query = query.filter(proof.isnot(None) if data.has_payment_proof else proof.is_(None))
+
+    current = {row.id: row.status for row in query.with_for_update()}
+    changed = set(set_orders_status(db, current, data.status))
+    db.commit()
+
+    requested = data.order_ids if data.order_ids is not None else sorted(current)
+    results = []
+    for order_id in dict.fromkeys(requested):
+        if order_id not in current:
+            results.append(BulkOrderStatusResult(id=order_id, result="not_found"))
+        else:
+            results.append(BulkOrderStatusResult(
+                id=order_id,
+                result="updated" if order_id in changed else "unchanged",
+                previous_status=current[order_id]
+            ))
 
-    report_data = list(user_map.values())
+    return BulkOrderStatusResponse(status=data.status, updated=len(changed), results=results)
 
-    path = docx_utils.generate_table_setting_report(report_data, filename=f"Report_{date_query}.docx")
+
+@app.get("/admin/reports/docx")
+async def download_table_report(
+        date_query: date,
+        background: bool = False,
+        db=Depends(get_async_db),
+        admin: User = Depends(get_admin_user)
+):
+    key = await run_db(db, report_jobs.table_report_key, date_query)
+    path = report_jobs.cache_path(key)
+
+    if not os.path.exists(path):
+        future = report_jobs.find_job(key)
+        if future is None:
+            report_data = await run_db(db, report_jobs.table_report_data, date_query)
+            future = report_jobs.submit(key, report_data)
+
+        if background:
+            return JSONResponse(status_code=202, content=report_jobs.job_status(key))
+        await asyncio.wrap_future(future)
+        if not os.path.exists(path):
+            # a render for newer data of the same day replaced it meanwhile
+            raise HTTPException(status_code=409, detail="Report data changed while rendering, try again")
 
     return FileResponse(path, filename=f"Table_Report_{date_query}.docx")
 
+
+@app.get("/admin/reports/jobs/{job_id}")
+def get_report_job(job_id: str, admin: User = Depends(get_admin_user)):
+    job = report_jobs.job_status(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    if job["status"] == "done":
+        job["download_url"] = f"/admin/reports/docx?date_query={job['date']}"
+    return job
+
+DAYS_MAP = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
 @app.get("/module-menu/export")
-def export_module_menu(db: Session = Depends(get_db), admin: User = Depends(get_admin_user)):
-    menu_items = db.query(ModuleMenu).join(Dish).order_by(ModuleMenu.day_of_week).all()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Day', 'Dish Name', 'Type', 'Grams', 'Price'])
-
-    days_map = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-
-    for item in menu_items:
-        writer.writerow([
-            days_map[item.day_of_week],
-            item.dish.name,
-            item.dish.type,
-            item.dish.quantity_grams,
-            item.dish.price_rub
-        ])
-
-    output.seek(0)
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=module_menu.csv"}
+def export_module_menu(admin: User = Depends(get_admin_user)):
+    def build_query(session: Session):
+        return session.query(
+            ModuleMenu.day_of_week, Dish.name, Dish.type, Dish.quantity_grams, Dish.price_rub
+        ).join(Dish, ModuleMenu.dish_id == Dish.id).order_by(ModuleMenu.day_of_week, ModuleMenu.id)
+
+    rows = (
+        (DAYS_MAP[day], name, dish_type, grams, price)
+        for day, name, dish_type, grams, price in exports.iter_query_rows(build_query)
     )
+    return exports.streaming_export("module_menu", ['Day', 'Dish Name', 'Type', 'Grams', 'Price'], rows)
 
 
-@app.get("/admin/reports/summary")
-def get_summary_report(date_query: date, db: Session = Depends(get_db), admin: User = Depends(get_admin_user)):
+ORDER_EXPORT_COLUMNS = [
+    Order.id, Order.user_id, User.email, Order.week_start_date, Order.created_at,
+    Order.status, Order.total_amount, Order.payment_proof_path
+]
+
+ORDER_ITEM_EXPORT_COLUMNS = [
+    OrderItem.id, OrderItem.order_id, Order.user_id, Order.week_start_date, Order.status,
+    OrderItem.day_of_week, OrderItem.dish_id, OrderItem.dish_name, OrderItem.quantity, OrderItem.unit_price
+]
 
-    day_idx = date_query.weekday()
 
+@app.get("/admin/export/orders")
+def export_orders(
+        format: Literal["csv", "ndjson"] = "csv",
+        week_start_date: Optional[date] = None,
+        admin: User = Depends(get_admin_user)
+):
+    def build_query(session: Session):
+        query = session.query(*ORDER_EXPORT_COLUMNS).join(User, Order.user_id == User.id)
+        if week_start_date:
+            query = query.filter(Order.week_start_date == week_start_date)
+        return query.order_by(Order.id)
 
-    stats = db.query(
-        Dish.name,
-        func.sum(OrderItem.quantity).label("total_qty"),
-        func.sum(OrderItem.quantity * Dish.price_rub).label("total_revenue")
-    ).join(OrderItem, OrderItem.dish_id == Dish.id) \
-        .join(Order, OrderItem.order_id == Order.id) \
-        .filter(OrderItem.day_of_week == day_idx) \
-        .filter(Order.status == OrderStatus.PAID) \
-        .group_by(Dish.id).all()
+    header = [column.key for column in ORDER_EXPORT_COLUMNS]
+    return exports.streaming_export("orders", header, exports.iter_query_rows(build_query), format)
 
-    total_day_revenue = sum(s.total_revenue for s in stats) if stats else 0
+
+@app.get("/admin/export/order-items")
+def export_order_items(
+        format: Literal["csv", "ndjson"] = "csv",
+        week_start_date: Optional[date] = None,
+        admin: User = Depends(get_admin_user)
+):
+    def build_query(session: Session):
+        query = session.query(*ORDER_ITEM_EXPORT_COLUMNS).join(Order, OrderItem.order_id == Order.id)
+        if week_start_date:
+            query = query.filter(Order.week_start_date == week_start_date)
+        return query.order_by(OrderItem.id)
+
+    header = [column.key for column in ORDER_ITEM_EXPORT_COLUMNS]
+    return exports.streaming_export("order_items", header, exports.iter_query_rows(build_query), format)
+
+
+@app.get("/admin/reports/summary")
+def get_summary_report(date_query: date, db: Session = Depends(get_db), admin: User = Depends(get_admin_user)):
+
+    stats = db.query(DailyDishStat) \
+        .filter(DailyDishStat.day == date_query, DailyDishStat.quantity > 0) \
+        .order_by(DailyDishStat.dish_id).all()
+
+    total_day_revenue = sum(s.revenue for s in stats) if stats else 0
 
     return {
         "date": date_query,
         "total_revenue": total_day_revenue,
         "items": [
             {
-                "dish": s.name,
-                "count": s.total_qty,
-                "revenue": s.total_revenue
+                "dish": s.dish_name,
+                "count": s.quantity,
+                "revenue": s.revenue
             }
             for s in stats
         ]
     }
 
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,61 @@
+import hashlib
+import threading
+from typing import Callable, Dict, Tuple
+
+from fastapi import Request, Response
+
+
+_lock = threading.Lock()
+_version = 0
+_entries: Dict[str, Tuple[int, bytes, str]] = {}
+
+
+def get_version() -> int:
+    return _version
+
+
+def invalidate() -> None:
+    global _version
+    with _lock:
+        _version += 1
+        _entries.clear()
+
+
+def get_or_build(key: str, build: Callable[[], bytes]) -> Tuple[bytes, str]:
+    with _lock:
+        version = _version
+        entry = _entries.get(key)
+
+    if entry and entry[0] == version:
+        return entry[1], entry[2]
+
+    body = build()
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+
+    with _lock:
+        # a write may have bumped the version while we were building
+        if _version == version:
+            _entries[key] = (version, body, etag)
+
+    return body, etag
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+def cached_json_response(request: Request, key: str, build: Callable[[], bytes]) -> Response:
+    body, etag = get_or_build(key, build)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,15 +1,22 @@
+import codecs
 import re
-from typing import List, Optional
-from pydantic import BaseModel
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator, List, NamedTuple, Optional
+from pydantic import TypeAdapter, conint, confloat
 
+from models import DishType
 
-class ParsedDish(BaseModel):
+
+class ParsedDish(NamedTuple):
     name: str
-    type: str
+    type: DishType
     composition: str
-    quantity_grams: int
-    price_rub: float
+    quantity_grams: conint(ge=0)
+    price_rub: confloat(ge=0)
+
 
+# validates a whole list of records in one call instead of one model per dish
+dish_list_adapter = TypeAdapter(List[ParsedDish])
 
 
 CATEGORY_MAP = {
@@ -24,61 +31,107 @@ CATEGORY_MAP = {
     "выпечка": "BREAD"
 }
 
-IGNORE_HEADERS = [
+IGNORE_HEADERS = frozenset([
     "название", "состав", "кол-во (г/шт.)", "цена",
     "период действия в меню", "штрихкод"
-]
+])
+
+# lines longer than this can't be a header, so they are never lower-cased
+HEADER_MAX_LENGTH = max(len(header) for header in [*IGNORE_HEADERS, *CATEGORY_MAP])
+
+NUMBER_PATTERN = re.compile(r'\d+')
+
+
+CHUNK_SIZE = 64 * 1024
+ENCODING_PREFIX_SIZE = 4096
+
+
+def detect_encoding(prefix: bytes) -> str:
+    """UTF-8 if the prefix decodes as UTF-8 (a cut-off trailing character is fine), cp1251 otherwise."""
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "cp1251"
+
+
+def iter_text_lines(fileobj: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    chunk = fileobj.read(max(chunk_size, ENCODING_PREFIX_SIZE))
+    decoder = codecs.getincrementaldecoder(detect_encoding(chunk))()
+    tail = ""
+
+    while chunk:
+        text = tail + decoder.decode(chunk)
+        lines = text.splitlines(keepends=True)
+        tail = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        for line in lines:
+            yield line
+        chunk = fileobj.read(chunk_size)
+
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_batches(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def validate_dishes(dishes: Iterable[ParsedDish]) -> List[ParsedDish]:
+    return dish_list_adapter.validate_python(list(dishes))
 
 
 def parse_menu_text(content: str) -> List[ParsedDish]:
-    lines = content.splitlines()
-    results = []
+    return validate_dishes(parse_menu_lines(content.splitlines()))
+
+
+def parse_menu_file(fileobj: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[ParsedDish]:
+    """Parses a menu file chunk by chunk, yielding dishes as soon as their 4 lines are read."""
+    return parse_menu_lines(iter_text_lines(fileobj, chunk_size))
 
+
+def parse_menu_lines(lines: Iterable[str]) -> Iterator[ParsedDish]:
+    """Yields unvalidated records; run them through validate_dishes (in bulk) before use."""
     current_type = "MAIN"
     buffer = []
-
-    number_pattern = re.compile(r'\d+')
+    search_number = NUMBER_PATTERN.search
 
     for line in lines:
         clean_line = line.strip()
-        lower_line = clean_line.lower()
 
         if not clean_line:
             continue
 
-        if lower_line in IGNORE_HEADERS:
-            continue
+        if len(clean_line) <= HEADER_MAX_LENGTH:
+            lower_line = clean_line.lower()
 
-        if lower_line in CATEGORY_MAP:
-            current_type = CATEGORY_MAP[lower_line]
-            buffer = []
-            continue
+            if lower_line in IGNORE_HEADERS:
+                continue
 
-        buffer.append(clean_line)
+            category = CATEGORY_MAP.get(lower_line)
+            if category is not None:
+                current_type = category
+                buffer = []
+                continue
 
+        buffer.append(clean_line)
 
         if len(buffer) == 4:
-            try:
-                name = buffer[0]
-                composition = buffer[1]
-
-                w_match = number_pattern.search(buffer[2])
-                weight = int(w_match.group()) if w_match else 0
-
-                p_match = number_pattern.search(buffer[3])
-                price = float(p_match.group()) if p_match else 0.0
-
-                dish = ParsedDish(
-                    name=name,
-                    type=current_type,
-                    composition=composition,
-                    quantity_grams=weight,
-                    price_rub=price
-                )
-                results.append(dish)
-            except Exception as e:
-                print(f"Ошибка при парсинге блюда {buffer[0]}: {e}")
-
+            name, composition, weight_line, price_line = buffer
+
+            w_match = search_number(weight_line)
+            p_match = search_number(price_line)
+
+            yield ParsedDish(
+                name,
+                current_type,
+                composition,
+                int(w_match.group()) if w_match else 0,
+                float(p_match.group()) if p_match else 0.0
+            )
             buffer = []
-
-    return results
\ No newline at end of file
@@ -0,0 +1,86 @@
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from menu_parser import ParsedDish, iter_batches, validate_dishes
+from models import Dish
+
+
+SYNC_BATCH_SIZE = 500
+
+SYNCED_FIELDS = ("type", "composition", "quantity_grams", "price_rub")
+
+
+def sync_menu(session: Session, dishes: Iterable[ParsedDish], is_provider: bool) -> Dict[str, int]:
+    """Brings the dishes of one menu (provider or own kitchen) in line with an uploaded file.
+
+    Dishes are matched by name: new ones are inserted, changed ones updated
+    in place (keeping their ids), and ones missing from the file retired.
+    Nothing is written for dishes that did not change. Does not commit.
+    """
+    menu = MenuSync(is_provider)
+    menu.load(session)
+    for batch in iter_batches(dishes, SYNC_BATCH_SIZE):
+        menu.apply(session, validate_dishes(batch))
+    return menu.finish(session)
+
+
+def read_menu_batch(batches: Iterator[List[ParsedDish]]) -> Optional[List[ParsedDish]]:
+    """Parses and validates the next batch, or returns None at the end; CPU-bound, so keep it off the event loop."""
+    batch = next(batches, None)
+    return None if batch is None else validate_dishes(batch)
+
+
+class MenuSync:
+    """sync_menu in steps, so each batch can be written as soon as it is parsed elsewhere.
+
+    load() once, apply() for every validated batch, then finish(); none of
+    them commit.
+    """
+
+    def __init__(self, is_provider: bool):
+        self.is_provider = is_provider
+        self.existing = {}
+        self.seen = set()
+        self.summary = {"added": 0, "updated": 0, "unchanged": 0, "retired": 0}
+
+    def load(self, session: Session) -> None:
+        self.existing = {
+            row.name: row for row in session.query(
+                Dish.id, Dish.name, Dish.type, Dish.composition, Dish.quantity_grams, Dish.price_rub, Dish.is_active
+            ).filter(Dish.is_provider == self.is_provider)
+        }
+
+    def apply(self, session: Session, batch: List[ParsedDish]) -> None:
+        inserts = []
+        updates = []
+        for item in batch:
+            if item.name in self.seen:
+                continue
+            self.seen.add(item.name)
+
+            values = {field: getattr(item, field) for field in SYNCED_FIELDS}
+            current = self.existing.get(item.name)
+            if current is None:
+                inserts.append(dict(values, name=item.name, is_provider=self.is_provider, is_active=True))
+            elif current.is_active and all(getattr(current, field) == value for field, value in values.items()):
+                self.summary["unchanged"] += 1
+            else:
+                updates.append(dict(values, id=current.id, is_active=True))
+
+        if inserts:
+            session.execute(insert(Dish), inserts)
+        if updates:
+            session.execute(update(Dish), updates)
+        self.summary["added"] += len(inserts)
+        self.summary["updated"] += len(updates)
+
+    def finish(self, session: Session) -> Dict[str, int]:
+        retired = [row.id for name, row in self.existing.items() if name not in self.seen and row.is_active]
+        if self.seen and retired:
+            session.execute(update(Dish).where(Dish.id.in_(retired)).values(is_active=False))
+            self.summary["retired"] = len(retired)
+
+        self.summary["total"] = len(self.seen)
+        return self.summary
@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# adds Server-Timing (total, db time, query count) to every response
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# requests that matched no route share one label, so scanners can't inflate the series count
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "query_started")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.query_started = 0.0
+
+
+# the object is shared by reference, so threadpool and run_sync work is counted too
+request_stats_var: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "queries", "db_seconds")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_seconds = 0.0
+
+    def snapshot(self) -> "RouteMetrics":
+        copy = RouteMetrics()
+        for name in ("latency", "queries"):
+            source, target = getattr(self, name), getattr(copy, name)
+            target.counts, target.total, target.count = source.counts[:], source.total, source.count
+        copy.db_seconds = self.db_seconds
+        return copy
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.responses: Dict[Tuple[str, str, int], int] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        with self._lock:
+            entry = self.routes.get((method, route))
+            if entry is None:
+                entry = self.routes[(method, route)] = RouteMetrics()
+            entry.latency.observe(seconds)
+            entry.queries.observe(stats.queries)
+            entry.db_seconds += stats.db_seconds
+
+            key = (method, route, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def render(self) -> str:
+        """Prometheus text exposition format, version 0.0.4."""
+        with self._lock:
+            routes = [(key, entry.snapshot()) for key, entry in sorted(self.routes.items())]
+            responses = sorted(self.responses.items())
+
+        lines: List[str] = []
+        _render_histogram(lines, "http_request_duration_seconds",
+                          "Time from request start to the end of the response.",
+                          [(key, entry.latency) for key, entry in routes])
+        _render_histogram(lines, "http_request_db_queries", "SQL statements executed per request.",
+                          [(key, entry.queries) for key, entry in routes])
+
+        lines.append("# HELP http_request_db_seconds_total Time spent in SQL statements.")
+        lines.append("# TYPE http_request_db_seconds_total counter")
+        for (method, route), entry in routes:
+            lines.append(f"http_request_db_seconds_total{{{_labels(method=method, route=route)}}} {entry.db_seconds}")
+
+        lines.append("# HELP http_responses_total Responses by route and status code.")
+        lines.append("# TYPE http_responses_total counter")
+        for (method, route, status), count in responses:
+            lines.append(f"http_responses_total{{{_labels(method=method, route=route, status=status)}}} {count}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items())
+
+
+def _render_histogram(lines: List[str], name: str, help_text: str, series) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), histogram in series:
+        labels = _labels(method=method, route=route)
+        running = 0
+        for bound, count in zip(histogram.bounds, histogram.counts):
+            running += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {running}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+registry = Registry()
+
+
+# a request runs its statements one after another, so a single start slot per request is enough
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = request_stats_var.get()
+    if stats is not None:
+        stats.query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = request_stats_var.get()
+    if stats is not None:
+        stats.db_seconds += time.perf_counter() - stats.query_started
+        stats.queries += 1
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Counts statements and their time against the request that issued them; a no-op outside requests."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware recording latency per route template, plus optional Server-Timing."""
+
+    def __init__(self, app: ASGIApp, server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        stats = RequestStats()
+        status_code = 500
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    timing = (
+                        f'app;dur={elapsed_ms:.1f}, '
+                        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"'
+                    )
+                    message["headers"] = [*message.get("headers", ()), (b"server-timing", timing.encode())]
+            await send(message)
+
+        token = request_stats_var.set(stats)
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            request_stats_var.reset(token)
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            registry.observe(scope["method"], route, status_code, time.perf_counter() - started, stats)
@@ -0,0 +1,129 @@
+from datetime import datetime
+from typing import Callable, List, Set, Tuple
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select
+from sqlalchemy.engine import Connection, Engine
+
+import report_stats
+from models import Base, Dish, OrderItem, OutboxEmail
+
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("name", String, primary_key=True),
+    Column("applied_at", DateTime, default=datetime.utcnow),
+)
+
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = []
+
+
+def migration(name: str):
+    def register(fn: Callable[[Connection], None]):
+        MIGRATIONS.append((name, fn))
+        return fn
+    return register
+
+
+def create_model_indexes(connection: Connection, names: Set[str]) -> None:
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in names:
+                index.create(connection, checkfirst=True)
+
+
+@migration("0001_report_indexes")
+def report_indexes(connection: Connection) -> None:
+    create_model_indexes(connection, {
+        "ix_orders_user_id",
+        "ix_orders_status_week_start_date",
+        "ix_order_items_order_id",
+        "ix_order_items_dish_id",
+        "ix_order_items_day_of_week_order_id",
+        "ix_module_menu_day_of_week",
+    })
+
+
+def missing_columns(connection: Connection, table: Table, names: List[str]) -> List[str]:
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    return [name for name in names if name not in existing]
+
+
+def add_missing_columns(connection: Connection, table: Table, names: List[str]) -> List[str]:
+    added = missing_columns(connection, table, names)
+    for name in added:
+        column_type = table.c[name].type.compile(connection.dialect)
+        connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}")
+    return added
+
+
+ORDER_ITEM_SNAPSHOTS = ["unit_price", "dish_name", "dish_short_name"]
+
+
+@migration("0002_backfill_daily_dish_stats")
+def backfill_daily_dish_stats(connection: Connection) -> None:
+    # the rebuild reads the order item snapshots; without them 0003 adds them and rebuilds
+    if not missing_columns(connection, OrderItem.__table__, ORDER_ITEM_SNAPSHOTS):
+        report_stats.rebuild_daily_stats(connection)
+
+
+@migration("0003_order_item_snapshots")
+def order_item_snapshots(connection: Connection) -> None:
+    table = OrderItem.__table__
+    add_missing_columns(connection, table, ORDER_ITEM_SNAPSHOTS)
+
+    dishes = Dish.__table__
+
+    def from_dish(column):
+        return select(column).where(dishes.c.id == table.c.dish_id).scalar_subquery()
+
+    connection.execute(
+        table.update()
+        .where(table.c.unit_price.is_(None))
+        .values(
+            unit_price=from_dish(dishes.c.price_rub),
+            dish_name=from_dish(dishes.c.name),
+            dish_short_name=from_dish(dishes.c.short_name)
+        )
+    )
+    # daily_dish_stats aggregates the snapshots, so it is built (again) from them
+    report_stats.rebuild_daily_stats(connection)
+
+
+@migration("0004_dish_is_active")
+def dish_is_active(connection: Connection) -> None:
+    table = Dish.__table__
+    add_missing_columns(connection, table, ["is_active"])
+    connection.execute(table.update().where(table.c.is_active.is_(None)).values(is_active=True))
+
+
+@migration("0005_dish_filter_index")
+def dish_filter_index(connection: Connection) -> None:
+    create_model_indexes(connection, {"ix_dishes_is_provider_type"})
+
+
+@migration("0006_email_outbox_claims")
+def email_outbox_claims(connection: Connection) -> None:
+    # outboxes created before claim leases existed
+    OutboxEmail.__table__.create(connection, checkfirst=True)
+    add_missing_columns(connection, OutboxEmail.__table__, ["claim_token", "claimed_at"])
+
+
+def run_migrations(engine: Engine) -> List[str]:
+    """Applies every migration not yet recorded in schema_migrations, each in its own transaction."""
+    migration_metadata.create_all(bind=engine)
+
+    with engine.connect() as connection:
+        applied = set(connection.execute(select(schema_migrations.c.name)).scalars())
+
+    done = []
+    for name, fn in MIGRATIONS:
+        if name in applied:
+            continue
+        with engine.begin() as connection:
+            fn(connection)
+            connection.execute(schema_migrations.insert().values(name=name, applied_at=datetime.utcnow()))
+        done.append(name)
+    return done
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, Enum, Date, DateTime, Text
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, Float, Enum, Date, DateTime, Text, UniqueConstraint
 from sqlalchemy.orm import relationship, declarative_base
 import enum
 from datetime import datetime
@@ -22,6 +22,13 @@ class OrderStatus(str, enum.Enum):
     PROBLEM = "PROBLEM"
 
 
+class EmailStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    SENDING = "SENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -48,13 +55,19 @@ class Dish(Base):
     quantity_grams = Column(Integer)
     price_rub = Column(Float)
     is_provider = Column(Boolean, default=True)
+    # dishes dropped from an uploaded menu are retired instead of deleted, old orders keep pointing at them
+    is_active = Column(Boolean, default=True)
+
+    __table_args__ = (
+        Index("ix_dishes_is_provider_type", "is_provider", "type"),
+    )
 
 
 class ModuleMenu(Base):
     __tablename__ = "module_menu"
 
     id = Column(Integer, primary_key=True, index=True)
-    day_of_week = Column(Integer)
+    day_of_week = Column(Integer, index=True)
     dish_id = Column(Integer, ForeignKey("dishes.id"))
 
     dish = relationship("Dish")
@@ -64,7 +77,7 @@ class Order(Base):
     __tablename__ = "orders"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     week_start_date = Column(Date)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -75,15 +88,68 @@ class Order(Base):
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order")
 
+    __table_args__ = (
+        Index("ix_orders_status_week_start_date", "status", "week_start_date"),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
-    dish_id = Column(Integer, ForeignKey("dishes.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
+    dish_id = Column(Integer, ForeignKey("dishes.id"), index=True)
     day_of_week = Column(Integer)  # 0-6
     quantity = Column(Integer)
 
+    # copied from the dish when the order is placed, so later menu uploads don't change old orders
+    unit_price = Column(Float)
+    dish_name = Column(String)
+    dish_short_name = Column(String, nullable=True)
+
     order = relationship("Order", back_populates="items")
-    dish = relationship("Dish")
\ No newline at end of file
+    dish = relationship("Dish")
+
+    __table_args__ = (
+        Index("ix_order_items_day_of_week_order_id", "day_of_week", "order_id"),
+    )
+
+
+class DailyDishStat(Base):
+    """Paid quantity and revenue per dish and calendar day, kept in step with order status changes."""
+    __tablename__ = "daily_dish_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    dish_id = Column(Integer, nullable=False)
+    dish_name = Column(String)
+    quantity = Column(Integer, default=0)
+    revenue = Column(Float, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("day", "dish_id", name="uq_daily_dish_stats_day_dish_id"),
+    )
+
+
+class OutboxEmail(Base):
+    """Mail written in the same transaction as the change that triggers it; email_outbox.py delivers it."""
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+
+    status = Column(Enum(EmailStatus), default=EmailStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    # set while a dispatcher holds the row in SENDING
+    claim_token = Column(String, nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
@@ -0,0 +1,159 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Protocol, Tuple
+
+from fastapi import HTTPException, Request, status
+
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+# only behind a proxy that appends the client address to X-Forwarded-For
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0") == "1"
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_SWEEP_SECONDS = 60.0
+
+
+class Limit(NamedTuple):
+    """Bucket of capacity tokens, refilled at capacity per period_seconds."""
+    capacity: int
+    period_seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period_seconds
+
+
+def parse_limit(spec: str) -> Limit:
+    """"5/600" is a burst of 5, refilled over 600 seconds."""
+    capacity, _, period = spec.partition("/")
+    return Limit(int(capacity), float(period))
+
+
+# per route: (by client IP, by email in the body)
+LIMITS: Dict[str, Tuple[Limit, Limit]] = {
+    "register": (
+        parse_limit(os.getenv("RATE_LIMIT_REGISTER_IP", "10/600")),
+        parse_limit(os.getenv("RATE_LIMIT_REGISTER_EMAIL", "3/600")),
+    ),
+    "verify-code": (
+        parse_limit(os.getenv("RATE_LIMIT_VERIFY_IP", "30/600")),
+        parse_limit(os.getenv("RATE_LIMIT_VERIFY_EMAIL", "5/600")),
+    ),
+    "resend-code": (
+        parse_limit(os.getenv("RATE_LIMIT_RESEND_IP", "10/600")),
+        parse_limit(os.getenv("RATE_LIMIT_RESEND_EMAIL", "3/600")),
+    ),
+}
+
+
+class RateLimitBackend(Protocol):
+    def take(self, key: str, limit: Limit, now: Optional[float] = None) -> float:
+        """Spends one token from key's bucket; returns 0 if allowed, otherwise seconds until a token is free."""
+
+
+class MemoryBackend:
+    """Token buckets for a single process, as (tokens, updated_at, full_at) tuples kept in LRU order.
+
+    A bucket that has refilled completely carries no information, so those
+    past full_at are swept out once a minute. Past max_keys, each new key
+    evicts the least recently touched one.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, sweep_seconds: float = RATE_LIMIT_SWEEP_SECONDS):
+        self.max_keys = max_keys
+        self.sweep_seconds = sweep_seconds
+        self._buckets: "OrderedDict[str, Tuple[float, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_seconds
+
+    def take(self, key: str, limit: Limit, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    # least recently touched key; O(1), unlike a sweep
+                    self._buckets.popitem(last=False)
+                tokens = float(limit.capacity)
+            else:
+                self._buckets.move_to_end(key)
+                tokens = min(limit.capacity, bucket[0] + (now - bucket[1]) * limit.rate)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (limit.capacity - tokens) / limit.rate)
+
+            return 0.0 if allowed else (1 - tokens) / limit.rate
+
+    def _sweep(self, now: float) -> None:
+        for key in [key for key, bucket in self._buckets.items() if bucket[2] <= now]:
+            del self._buckets[key]
+        self._next_sweep = now + self.sweep_seconds
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+backend: RateLimitBackend = MemoryBackend()
+
+
+def set_backend(new_backend: RateLimitBackend) -> None:
+    """Swaps the bucket store, e.g. for one shared between workers."""
+    global backend
+    backend = new_backend
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.rsplit(",", 1)[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def _body_email(request: Request) -> Optional[str]:
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    email = body.get("email") if isinstance(body, dict) else None
+    return email.strip().lower() if isinstance(email, str) else None
+
+
+def _reject(wait: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests",
+        headers={"Retry-After": str(max(1, math.ceil(wait)))},
+    )
+
+
+def limit(name: str):
+    """Dependency for a public auth route; raises 429 before the endpoint, and its DB session, does anything.
+
+    Use it in the route's dependencies=[...], which FastAPI resolves ahead of
+    the endpoint's own parameters.
+    """
+    by_ip, by_email = LIMITS[name]
+
+    async def check(request: Request) -> None:
+        if not RATE_LIMIT_ENABLED:
+            return
+
+        wait = backend.take(f"{name}:ip:{client_ip(request)}", by_ip)
+        if wait:
+            raise _reject(wait)
+
+        email = await _body_email(request)
+        if email:
+            wait = backend.take(f"{name}:email:{email}", by_email)
+            if wait:
+                raise _reject(wait)
+
+    return check
@@ -0,0 +1,183 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import docx_utils
+from models import Order, OrderItem, OrderStatus, User
+
+
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", os.path.join("reports", "cache"))
+# 0 renders in a single background thread instead of a process pool
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+MAX_TRACKED_JOBS = 200
+
+_executor: Optional[Executor] = None
+_jobs: "OrderedDict[str, Future]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _week_filters(date_query: date):
+    day_idx = date_query.weekday()
+    return (
+        Order.status == OrderStatus.PAID,
+        Order.week_start_date == date_query - timedelta(days=day_idx),
+        OrderItem.day_of_week == day_idx,
+    )
+
+
+def table_report_data(session: Session, date_query: date) -> List[dict]:
+    dish_name = func.coalesce(OrderItem.dish_short_name, OrderItem.dish_name)
+
+    rows = session.query(
+        User.id,
+        User.name,
+        User.secondary_name,
+        User.status,
+        func.max(dish_name).label("dish_name"),
+        func.sum(OrderItem.quantity).label("quantity")
+    ).select_from(OrderItem) \
+        .join(Order, OrderItem.order_id == Order.id) \
+        .join(User, Order.user_id == User.id) \
+        .filter(*_week_filters(date_query)) \
+        .filter(OrderItem.dish_name.isnot(None)) \
+        .group_by(User.id, OrderItem.dish_id) \
+        .order_by(User.id, func.min(OrderItem.id)) \
+        .all()
+
+    user_map = {}
+    for row in rows:
+        entry = user_map.get(row.id)
+        if entry is None:
+            entry = user_map[row.id] = {
+                "user_name": f"{row.name} {row.secondary_name}",
+                "user_class": row.status,
+                "dishes": []
+            }
+        entry["dishes"].extend([row.dish_name] * row.quantity)
+
+    return list(user_map.values())
+
+
+def table_report_key(session: Session, date_query: date) -> str:
+    """<date>_<stamp>, where the stamp changes whenever the set of paid order items for that day does.
+
+    Order items are never edited after creation, so their ids are enough.
+    """
+    item_ids = session.query(OrderItem.id) \
+        .join(Order, OrderItem.order_id == Order.id) \
+        .filter(*_week_filters(date_query)) \
+        .order_by(OrderItem.id) \
+        .all()
+
+    digest = hashlib.sha1(",".join(str(row.id) for row in item_ids).encode()).hexdigest()
+    return f"{date_query}_{digest[:16]}"
+
+
+def cache_path(key: str) -> str:
+    return os.path.join(REPORT_CACHE_DIR, f"Report_{key}.docx")
+
+
+def render_report(report_data: List[dict], path: str) -> str:
+    """Runs in a worker process; writes next to the target and renames, so readers never see a partial file."""
+    directory, filename = os.path.split(path)
+    tmp_name = f".{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    tmp_path = docx_utils.generate_table_setting_report(report_data, filename=tmp_name, directory=directory)
+    os.replace(tmp_path, path)
+    _remove_stale_reports(directory, filename)
+    return path
+
+
+def _remove_stale_reports(directory: str, filename: str) -> None:
+    """Drops reports for the same date under older stamps; nothing will ask for those keys again."""
+    prefix = filename.rsplit("_", 1)[0] + "_"
+    for name in os.listdir(directory):
+        if name != filename and name.startswith(prefix) and name.endswith(".docx"):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if REPORT_WORKERS > 0:
+            _executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=1)
+    return _executor
+
+
+def _usable(key: str, future: Optional[Future]) -> bool:
+    """Running, or finished with its file still there; a failed or pruned render has to be redone."""
+    if future is None:
+        return False
+    if not future.done():
+        return True
+    return future.exception() is None and os.path.exists(cache_path(key))
+
+
+def _forget_stale_jobs(key: str, future: Future) -> None:
+    # render_report has removed the files of the other keys for this date
+    if future.cancelled() or future.exception() is not None:
+        return
+    prefix = key.split("_", 1)[0] + "_"
+    with _lock:
+        for stale in [other for other in _jobs if other != key and other.startswith(prefix)]:
+            if _jobs[stale].done():
+                del _jobs[stale]
+
+
+def find_job(key: str) -> Optional[Future]:
+    with _lock:
+        future = _jobs.get(key)
+    return future if _usable(key, future) else None
+
+
+def submit(key: str, report_data: List[dict]) -> Future:
+    """Starts rendering the report for key, or returns the job already doing it."""
+    with _lock:
+        future = _jobs.get(key)
+        if _usable(key, future):
+            return future
+
+        future = _get_executor().submit(render_report, report_data, cache_path(key))
+        _jobs[key] = future
+        while len(_jobs) > MAX_TRACKED_JOBS:
+            _jobs.popitem(last=False)
+    future.add_done_callback(lambda done: _forget_stale_jobs(key, done))
+    return future
+
+
+def job_status(key: str) -> Optional[dict]:
+    status = {"job_id": key, "date": key.split("_", 1)[0]}
+
+    if os.path.exists(cache_path(key)):
+        return dict(status, status="done")
+
+    with _lock:
+        future = _jobs.get(key)
+    if future is None:
+        return None
+    if not future.done():
+        return dict(status, status="running" if future.running() else "pending")
+    if future.exception() is not None:
+        return dict(status, status="failed", error=str(future.exception()))
+    # finished, but the file has since been replaced by a newer report for the date
+    return None
+
+
+def shutdown() -> None:
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+        _jobs.clear()
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
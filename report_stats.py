@@ -0,0 +1,108 @@
+from datetime import timedelta
+from typing import Iterable, List
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import DailyDishStat, Order, OrderItem, OrderStatus
+
+
+UPSERT_DIALECTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def paid_item_totals(bind, order_ids: Iterable[int] = None) -> List[dict]:
+    """Quantity and revenue grouped by (day, dish) for the given orders, or for every paid order."""
+    query = select(
+        Order.week_start_date,
+        OrderItem.day_of_week,
+        OrderItem.dish_id,
+        func.max(OrderItem.dish_name).label("dish_name"),
+        func.sum(OrderItem.quantity).label("quantity"),
+        func.sum(OrderItem.quantity * func.coalesce(OrderItem.unit_price, 0.0)).label("revenue")
+    ).select_from(OrderItem) \
+        .join(Order, OrderItem.order_id == Order.id) \
+        .group_by(Order.week_start_date, OrderItem.day_of_week, OrderItem.dish_id)
+
+    if order_ids is None:
+        query = query.filter(Order.status == OrderStatus.PAID)
+    else:
+        query = query.filter(Order.id.in_(list(order_ids)))
+
+    return [
+        {
+            "day": row.week_start_date + timedelta(days=row.day_of_week),
+            "dish_id": row.dish_id,
+            "dish_name": row.dish_name,
+            "quantity": row.quantity,
+            "revenue": row.revenue or 0.0,
+        }
+        for row in bind.execute(query)
+    ]
+
+
+def _dialect_name(bind) -> str:
+    if hasattr(bind, "get_bind"):
+        return bind.get_bind().dialect.name
+    return bind.dialect.name
+
+
+def apply_order_stats(bind, order_ids: Iterable[int], sign: int) -> None:
+    """Adds (sign=1) or removes (sign=-1) the items of the given orders from daily_dish_stats."""
+    rows = [
+        dict(row, quantity=sign * row["quantity"], revenue=sign * row["revenue"])
+        for row in paid_item_totals(bind, order_ids)
+    ]
+    if not rows:
+        return
+
+    table = DailyDishStat.__table__
+    upsert = UPSERT_DIALECTS.get(_dialect_name(bind))
+
+    if upsert is not None:
+        stmt = upsert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.dish_id],
+            set_={
+                "quantity": table.c.quantity + stmt.excluded.quantity,
+                "revenue": table.c.revenue + stmt.excluded.revenue,
+            }
+        )
+        bind.execute(stmt, rows)
+    else:
+        for row in rows:
+            updated = bind.execute(
+                table.update()
+                .where(table.c.day == row["day"], table.c.dish_id == row["dish_id"])
+                .values(quantity=table.c.quantity + row["quantity"], revenue=table.c.revenue + row["revenue"])
+            )
+            if not updated.rowcount:
+                bind.execute(table.insert().values(**row))
+
+    if sign < 0:
+        bind.execute(delete(table).where(table.c.quantity <= 0))
+
+
+def rebuild_daily_stats(bind) -> int:
+    """Recomputes daily_dish_stats from every paid order; returns the number of rows written."""
+    table = DailyDishStat.__table__
+    rows = paid_item_totals(bind)
+
+    bind.execute(delete(table))
+    if rows:
+        bind.execute(table.insert(), rows)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from database import DATABASE_URL, make_engine
+
+    database_url = sys.argv[1] if len(sys.argv) > 1 else DATABASE_URL
+    engine = make_engine(database_url)
+    with engine.begin() as connection:
+        count = rebuild_daily_stats(connection)
+    print(f"Rebuilt daily_dish_stats: {count} rows")
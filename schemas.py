@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional
 from models import DishType, OrderStatus
-from datetime import date
+from datetime import date, datetime
 
 class UserCreate(BaseModel):
     name: str
@@ -71,6 +71,38 @@ class OrderResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class OrderItemDetail(BaseModel):
+    id: int
+    dish_id: int
+    dish_name: Optional[str] = None
+    dish_type: Optional[DishType] = None
+    unit_price: Optional[float] = None
+    quantity: int
+
+class OrderDayDetail(BaseModel):
+    day_of_week: int
+    items: List[OrderItemDetail]
+
+class OrderDetailResponse(OrderResponse):
+    created_at: Optional[datetime] = None
+    days: List[OrderDayDetail]
+
+class BulkOrderStatusRequest(BaseModel):
+    status: OrderStatus
+    order_ids: Optional[List[int]] = None
+    week_start_date: Optional[date] = None
+    has_payment_proof: Optional[bool] = None
+
+class BulkOrderStatusResult(BaseModel):
+    id: int
+    result: str
+    previous_status: Optional[OrderStatus] = None
+
+class BulkOrderStatusResponse(BaseModel):
+    status: OrderStatus
+    updated: int
+    results: List[BulkOrderStatusResult]
+
 class VerifyCodeRequest(BaseModel):
     email: EmailStr
     code: str
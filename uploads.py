@@ -0,0 +1,137 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# room for the multipart boundaries, part headers and small form fields around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+SAFE_EXTENSION = re.compile(r"^\.[a-z0-9]{1,10}$")
+
+
+def safe_extension(filename: str) -> str:
+    ext = os.path.splitext(os.path.basename(filename or ""))[1].lower()
+    return ext if SAFE_EXTENSION.match(ext) else ""
+
+
+def _discard(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _commit(tmp_path: str, final_path: str) -> None:
+    if os.path.exists(final_path):
+        # same content is already stored
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, final_path)
+
+
+async def save_upload(
+        file: UploadFile,
+        directory: str = UPLOAD_DIR,
+        max_bytes: int = MAX_UPLOAD_BYTES
+) -> str:
+    """Streams an upload to <directory>/<sha256><ext> and returns that path.
+
+    The file is written in chunks to a temp file in the same directory and
+    renamed into place, so readers never see partial files and identical
+    uploads are stored once. The client-supplied name only contributes a
+    sanitized extension.
+
+    This is the second copy: Starlette has already spooled the whole multipart
+    body to its own temp file. UploadSizeLimitMiddleware is what bounds that
+    one; max_bytes here only catches files that fit the body limit but not ours.
+    """
+    await run_in_threadpool(os.makedirs, directory, exist_ok=True)
+    fd, tmp_path = await run_in_threadpool(tempfile.mkstemp, ".part", "upload-", directory)
+    out = os.fdopen(fd, "wb")
+
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"File too large (max {max_bytes} bytes)")
+            hasher.update(chunk)
+            await run_in_threadpool(out.write, chunk)
+        await run_in_threadpool(out.close)
+    except BaseException:
+        out.close()
+        await run_in_threadpool(_discard, tmp_path)
+        raise
+
+    if size == 0:
+        await run_in_threadpool(_discard, tmp_path)
+        raise HTTPException(status_code=400, detail="Empty file")
+
+    final_path = os.path.join(directory, hasher.hexdigest() + safe_extension(file.filename))
+    await run_in_threadpool(_commit, tmp_path, final_path)
+    return final_path
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Request body too large (max {max_bytes} bytes)")
+
+
+class UploadSizeLimitMiddleware:
+    """Plain ASGI middleware capping multipart bodies before Starlette spools them to disk.
+
+    A declared Content-Length over the cap is refused without reading the body;
+    otherwise the bytes actually received are counted, which also covers
+    chunked requests.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        content_type = content_length = b""
+        for name, value in scope["headers"]:
+            if name == b"content-type":
+                content_type = value
+            elif name == b"content-length":
+                content_length = value
+        if not content_type.lower().startswith(b"multipart/"):
+            await self.app(scope, receive, send)
+            return
+
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            error = _too_large(self.max_bytes)
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI re-raises HTTPExceptions from body parsing as they are
+                    raise _too_large(self.max_bytes)
+            return message
+
+        await self.app(scope, receive_limited, send)